@@ -0,0 +1,115 @@
+"""
+Compare the sync gspread path with the async client keeping several chunk
+writes in flight, for a bulk CSV append and a CSV update, against the fake
+Sheets server. Every run must leave its worksheet with the same rows as the
+sync run.
+
+The server runs in its own process, like the real API: in-process it would
+share the GIL with CSV parsing and formatting and hide the overlap.
+
+Run from the project root:
+    python -m benchmarks.bench_async [rows] [latency_seconds] [chunk_size]
+"""
+import contextlib
+import io
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+from benchmarks.bench_fake_server import CELL_FORMATS, UNLIMITED, write_csv
+from src import runner
+from src.fake_sheets import local_client
+
+IN_FLIGHT = (1, 4, 8)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.contextmanager
+def server_process(latency, titles):
+    """Fake Sheets server in a child process, with one empty worksheet per title; yields its URL."""
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    process = subprocess.Popen(
+        [sys.executable, "-m", "src.fake_sheets", "--port", str(port), "--latency", str(latency),
+         "--spreadsheet-id", "bench", "--sheets", ",".join(titles)],
+        stdout=subprocess.DEVNULL,
+    )
+    try:
+        for _ in range(100):
+            try:
+                requests.get(f"{url}/v4/spreadsheets/bench", timeout=1)
+                break
+            except requests.ConnectionError:
+                time.sleep(0.1)
+        yield url
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main(count=50_000, latency=0.05, chunk_size=1000):
+    actions = {
+        "append": {
+            "action": "append",
+            "append_mode": "bulk",
+            "chunk_size": chunk_size,
+            "source_type": "csv",
+            "csv_file": "synthetic",
+            "cell_formats": CELL_FORMATS,
+        },
+        "update": {
+            "action": "update",
+            "target_cell": "A1",
+            "source_type": "csv",
+            "csv_file": "synthetic",
+            "cell_formats": CELL_FORMATS,
+        },
+    }
+    titles = [f"{name}_{in_flight}" for name in actions for in_flight in IN_FLIGHT]
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp, server_process(latency, titles) as url:
+        os.chdir(tmp)
+        try:
+            os.makedirs("csv")
+            write_csv(os.path.join("csv", "synthetic.csv"), count)
+            client = local_client(url, UNLIMITED)
+            spreadsheet = client.open_by_key("bench")
+            print(f"Rows: {count:,}  Latency: {latency * 1000:.0f} ms  Chunk: {chunk_size:,}\n")
+            print(f"{'action':<8} {'in flight':>9} {'seconds':>8} {'rows/s':>9} {'speedup':>8}")
+            for name, action in actions.items():
+                baseline = expected = None
+                for in_flight in IN_FLIGHT:
+                    title = f"{name}_{in_flight}"
+                    run = dict(action, name=title, sheet_name=title, in_flight=in_flight)
+                    start = time.perf_counter()
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        ok = runner.run_action(client, "bench", run, {}, interactive=False)
+                    elapsed = time.perf_counter() - start
+
+                    rows = spreadsheet.worksheet(title).get_all_values()
+                    if expected is None:
+                        baseline, expected = elapsed, rows
+                    same = ok and len(rows) == count and rows == expected
+                    print(f"{name:<8} {in_flight:>9} {elapsed:>8.2f} {count / elapsed:>9,.0f} "
+                          f"{baseline / elapsed:>7.1f}x" + ("" if same else "  ❌ rows differ from the sync run"))
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(
+        int(args[0]) if len(args) > 0 else 50_000,
+        float(args[1]) if len(args) > 1 else 0.05,
+        int(args[2]) if len(args) > 2 else 1000,
+    )
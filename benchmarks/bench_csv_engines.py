@@ -0,0 +1,58 @@
+"""
+Compare CSV parse throughput across csv_reader engines on a synthetic file.
+
+Run from the project root:
+    python -m benchmarks.bench_csv_engines [rows]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from src.csv_reader import ENGINES, read_csv
+
+CELL_FORMATS = [
+    {"type": "text", "default": "Title", "note": ""},
+    {"type": "link", "default": "Link", "note": ""},
+    {"type": "number", "default": 0, "note": ""},
+    {"type": "percent", "default": "", "note": ""},
+    {"type": "currency", "default": "", "note": ""},
+    {"type": "TAGS", "default": "tags", "note": ""},
+    {"type": "date", "default": "", "note": ""},
+]
+
+
+def write_csv(path, count):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("title,link,number,percent,currency,tags,date\n")
+        for i in range(count):
+            f.write(
+                f"Title {i},https://example.com/{i},{i},0.{i % 100:02d},{i % 1000}.99,"
+                f"a b c,01/31/2025 12:{i % 60:02d}:00\n"
+            )
+
+
+def time_read(label, func, count, size_mb):
+    start = time.perf_counter()
+    df = func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<18} {elapsed:7.2f}s  {count / elapsed:>11,.0f} rows/s  {size_mb / elapsed:7.1f} MB/s  "
+          f"{df.memory_usage(deep=True).sum() / 1e6:8.1f} MB in memory")
+
+
+def main(count=1_000_000):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "synthetic.csv")
+        write_csv(path, count)
+        size_mb = os.path.getsize(path) / 1e6
+        print(f"Rows: {count:,}  File: {size_mb:.1f} MB\n")
+
+        time_read("inferred (old)", lambda: pd.read_csv(path), count, size_mb)
+        for engine in ENGINES:
+            time_read(f"{engine} + schema", lambda: read_csv(path, CELL_FORMATS, engine=engine), count, size_mb)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,83 @@
+"""
+Load-test a bulk CSV append end to end (CSV read, formatting, gspread, rate
+limiter, HTTP) against the local fake Sheets server.
+
+Run from the project root:
+    python -m benchmarks.bench_fake_server [rows] [latency_seconds] [chunk_size]
+"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+from src import runner
+from src.fake_sheets import FakeSheetsServer, local_client
+
+CELL_FORMATS = [
+    {"type": "text", "default": "Title", "note": ""},
+    {"type": "link", "default": "Link", "note": ""},
+    {"type": "number", "default": 0, "note": ""},
+    {"type": "percent", "default": "", "note": ""},
+    {"type": "date", "default": "", "note": ""},
+]
+
+# High enough that the limiter never waits: this measures the pipeline, not the quota
+UNLIMITED = {
+    "read_per_minute": 1_000_000,
+    "write_per_minute": 1_000_000,
+    "project_read_per_minute": 1_000_000,
+    "project_write_per_minute": 1_000_000,
+}
+
+
+def write_csv(path, count):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("title,link,number,percent,date\n")
+        for i in range(count):
+            f.write(f"Title {i},https://example.com/{i},{i},0.{i % 100:02d},01/31/2025 12:{i % 60:02d}:00\n")
+
+
+def main(count=100_000, latency=0.05, chunk_size=1000):
+    action = {
+        "name": "bench_bulk",
+        "action": "append",
+        "sheet_name": "Main",
+        "append_mode": "bulk",
+        "chunk_size": chunk_size,
+        "source_type": "csv",
+        "csv_file": "synthetic",
+        "cell_formats": CELL_FORMATS,
+    }
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp, FakeSheetsServer(latency=latency) as server:
+        os.chdir(tmp)
+        try:
+            os.makedirs("csv")
+            write_csv(os.path.join("csv", "synthetic.csv"), count)
+            server.add_spreadsheet("bench", sheets={"Main": [["title", "link", "number", "percent", "date"]]})
+            client = local_client(server.url, UNLIMITED)
+            print(f"Rows: {count:,}  Latency: {latency * 1000:.0f} ms  Chunk: {chunk_size:,}\n")
+
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                ok = runner.run_action(client, "bench", action, {}, interactive=False)
+            elapsed = time.perf_counter() - start
+        finally:
+            os.chdir(cwd)
+
+        rows = len(server.spreadsheets["bench"].sheet("Main").rows) - 1
+        print(f"{'ok' if ok else 'FAILED'}: {rows:,} rows in {elapsed:.2f}s — {rows / elapsed:,.0f} rows/s")
+        print(f"Sent {server.bytes_in / 1e6:.1f} MB, received {server.bytes_out / 1e6:.1f} MB")
+        for endpoint, calls in sorted(server.counters.items()):
+            print(f"  {endpoint:<26} {calls:>6}")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(
+        int(args[0]) if len(args) > 0 else 100_000,
+        float(args[1]) if len(args) > 1 else 0.05,
+        int(args[2]) if len(args) > 2 else 1000,
+    )
@@ -0,0 +1,58 @@
+"""
+Compare helper.format_row with a compiled FormatPlan on synthetic rows.
+
+Run from the project root:
+    python -m benchmarks.bench_format_plan [rows]
+"""
+import sys
+import time
+
+from src.helper import format_row
+from src.format_plan import compile_formats
+
+CELL_FORMATS = [
+    {"type": "text", "default": "Title", "note": ""},
+    {"type": "link", "default": "Link", "note": ""},
+    {"type": "number", "default": 0, "note": ""},
+    {"type": "percent", "default": "", "note": ""},
+    {"type": "currency", "default": "", "note": ""},
+    {"type": "TAGS", "default": "tags", "note": ""},
+    {"type": "date", "default": "", "note": ""},
+    {"type": "formula", "default": "=SUM(C2:C10)", "note": "percent"},
+]
+
+
+def make_rows(count):
+    return [
+        [f"Title {i}", f"https://example.com/{i}", str(i), "0.25", "19.99",
+         "a,b,c", "01/31/2025 12:00:00", ""]
+        for i in range(count)
+    ]
+
+
+def time_it(func, rows):
+    start = time.perf_counter()
+    for row in rows:
+        func(row)
+    return time.perf_counter() - start
+
+
+def main(count=100_000, locale="US"):
+    rows = make_rows(count)
+    plan = compile_formats(CELL_FORMATS, locale)
+
+    # Both paths must agree before timing means anything
+    for row in rows[:1000]:
+        assert format_row(row, CELL_FORMATS, locale) == plan.format_row(row)
+
+    baseline = time_it(lambda row: format_row(row, CELL_FORMATS, locale), rows)
+    compiled = time_it(plan.format_row, rows)
+
+    print(f"Rows: {count}")
+    print(f"format_row: {baseline:.3f}s ({baseline / count * 1e6:.2f} µs/row)")
+    print(f"FormatPlan: {compiled:.3f}s ({compiled / count * 1e6:.2f} µs/row)")
+    print(f"Speedup:    {baseline / compiled:.2f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
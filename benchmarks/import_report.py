@@ -0,0 +1,65 @@
+"""
+Report cold-start import cost per top-level package, using `python -X importtime`
+in a fresh interpreter for each entry module.
+
+Run from the project root:
+    python -m benchmarks.import_report [module ...]
+"""
+import subprocess
+import sys
+from collections import defaultdict
+
+DEFAULT_MODULES = ["main", "src.runner", "src.append", "src.update", "src.csv_reader"]
+HEAVY_PACKAGES = ("pandas", "numpy", "pyarrow", "gspread", "google")
+
+
+def import_times(module):
+    """
+    Import `module` in a new interpreter and return {module name: self microseconds}.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    times = {}
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(self_us)
+    return times
+
+
+def by_package(times):
+    totals = defaultdict(int)
+    for name, self_us in times.items():
+        totals[name.split(".")[0]] += self_us
+    return totals
+
+
+def report(module, top=8):
+    try:
+        times = import_times(module)
+    except RuntimeError as e:
+        print(f"{module}: import failed — {e}")
+        return
+
+    totals = by_package(times)
+    heavy = [name for name in HEAVY_PACKAGES if name in totals]
+    print(f"{module}: {sum(totals.values()) / 1000:.1f} ms, {len(times)} modules, "
+          f"heavy: {', '.join(heavy) or 'none'}")
+    for name, self_us in sorted(totals.items(), key=lambda item: -item[1])[:top]:
+        print(f"  {name:<24} {self_us / 1000:8.1f} ms")
+
+
+def main():
+    for module in sys.argv[1:] or DEFAULT_MODULES:
+        report(module)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,56 @@
 import json
-import requests
 import os
 import shutil
 
+import requests
+
+DRIVE_FILES_URL = "https://www.googleapis.com/drive/v3/files"
+
+
+def open_session(config):
+    """
+    Authorized session when a service account is configured (and no local
+    api_endpoint is used), so Drive metadata and private sheets can be read;
+    a plain session otherwise.
+    """
+    credentials_file = config.get("credentials_file")
+    if config.get("api_endpoint") or not credentials_file or not os.path.exists(credentials_file):
+        return requests.Session()
+    from google.auth.transport.requests import AuthorizedSession
+    from google.oauth2.service_account import Credentials
+
+    scopes = ["https://www.googleapis.com/auth/drive.readonly"]
+    return AuthorizedSession(Credentials.from_service_account_file(credentials_file, scopes=scopes))
+
+
+def drive_metadata(session, config, spreadsheet_id):
+    """Drive `modifiedTime` and `version` of the spreadsheet, or None if they cannot be read."""
+    base_url = config.get("api_endpoint")
+    url = f"{base_url.rstrip('/')}/drive/v3/files/{spreadsheet_id}" if base_url else f"{DRIVE_FILES_URL}/{spreadsheet_id}"
+    try:
+        response = session.get(url, params={"fields": "modifiedTime,version", "supportsAllDrives": "true"}, timeout=30)
+        response.raise_for_status()
+        metadata = response.json()
+        return {"modifiedTime": metadata.get("modifiedTime"), "version": metadata.get("version")}
+    except (requests.RequestException, ValueError) as e:
+        print(f"⚠️ Could not read Drive metadata ({e}); falling back to a conditional download.")
+        return None
+
+
+def load_state(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_state(path, state):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+
+
 def main():
     # Load config.json
     with open("config.json", "r", encoding="utf-8") as f:
@@ -11,10 +59,11 @@ def main():
     spreadsheet_id = config.get("spreadsheet_id")
     if not spreadsheet_id:
         print("❌ 'spreadsheet_id' not found in config.json")
-        return
+        return False
 
-    # Construct download URL dynamically
-    download_link = f"https://docs.google.com/spreadsheets/d/{spreadsheet_id}/export?format=xlsx"
+    # Construct download URL dynamically (api_endpoint points it at a local fake server)
+    base_url = config.get("api_endpoint", "https://docs.google.com").rstrip("/")
+    download_link = f"{base_url}/spreadsheets/d/{spreadsheet_id}/export?format=xlsx"
 
     # Get filename from spreadsheet title or fallback
     filename = config.get("download_filename", f"{spreadsheet_id}.xlsx")
@@ -22,21 +71,49 @@ def main():
     temp_filename = f"{filename}.tmp"
     backup_filename = f"{os.path.splitext(filename)[0]}_backup.xlsx"
 
+    # What the last backup saw: Drive version and HTTP validators
+    state_path = os.path.join(config.get("cache_dir", "cache"), "backup", f"{spreadsheet_id}.json")
+    state = load_state(state_path) if os.path.exists(filename) else {}
+
+    session = open_session(config)
+
+    # Skip the download entirely if Drive reports the same revision as last time
+    metadata = drive_metadata(session, config, spreadsheet_id)
+    if metadata and metadata["modifiedTime"] and state and metadata == {k: state.get(k) for k in metadata}:
+        print(f"✅ Spreadsheet unchanged since the last backup (version {metadata['version']}); nothing to download.")
+        return True
+
+    headers = {}
+    if state.get("etag"):
+        headers["If-None-Match"] = state["etag"]
+    if state.get("last_modified"):
+        headers["If-Modified-Since"] = state["last_modified"]
+
     print(f"📥 Downloading Excel file from:\n{download_link}")
 
     try:
         # Download to temporary file
-        response = requests.get(download_link, stream=True, timeout=60)
+        response = session.get(download_link, stream=True, timeout=60, headers=headers)
+        if response.status_code == 304:
+            print("✅ Server reports the export is unchanged; nothing to download.")
+            save_state(state_path, dict(state, **(metadata or {})))
+            return True
         response.raise_for_status()
 
         with open(temp_filename, "wb") as f:
-            for chunk in response.iter_content(chunk_size=8192):
+            for chunk in response.iter_content(chunk_size=1 << 16):
                 f.write(chunk)
 
         # Verify file size > 0
         if os.path.getsize(temp_filename) == 0:
             raise ValueError("Downloaded file is empty")
 
+        new_state = {
+            **(metadata or {}),
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        }
+
         # Backup existing file (if any)
         if os.path.exists(filename):
             print(f"📦 Creating backup: {backup_filename}")
@@ -44,12 +121,15 @@ def main():
 
         # Replace main file
         shutil.move(temp_filename, filename)
+        save_state(state_path, new_state)
         print(f"✅ Download complete and saved as: {filename}")
+        return True
 
     except Exception as e:
         print(f"❌ Download failed: {e}")
         if os.path.exists(temp_filename):
             os.remove(temp_filename)
+        return False
 
 if __name__ == "__main__":
     main()
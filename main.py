@@ -1,9 +1,15 @@
 # main.py
+import argparse
 import json
-import gspread
-from google.oauth2.service_account import Credentials
+import os
+import sys
+import time
 from src import manage_actions
-from src import append  # we'll create this next
+from src import runner
+from src.sheet_cache import SheetCache, DEFAULT_TTL
+
+# gspread, google-auth and pandas are imported only on the code paths that
+# use them, so the menu and custom scripts start fast.
 
 
 def load_config():
@@ -25,34 +31,227 @@ def load_actions():
         return []
 
 
-def init_gspread_client(credentials_file):
-    """Initialize gspread client using service account credentials"""
+def init_gspread_client(credentials_file, rate_limits=None):
+    """
+    Initialize gspread client using service account credentials.
+    Every request goes through the shared quota limiter (see src/rate_limit.py).
+    """
     try:
+        import gspread
+        from google.oauth2.service_account import Credentials
+        from src.rate_limit import rate_limited_http_client
+
         SCOPES = [
             "https://www.googleapis.com/auth/spreadsheets",
             "https://www.googleapis.com/auth/drive"
         ]
         creds = Credentials.from_service_account_file(credentials_file, scopes=SCOPES)
-        return gspread.authorize(creds)
+        http_client = rate_limited_http_client(rate_limits, creds.project_id or "default")
+        return gspread.authorize(creds, http_client=http_client)
     except Exception as e:
         print(f"❌ Failed to initialize gspread client: {e}")
         return None
 
 
-def main():
-    config = load_config()
-    client = init_gspread_client(config.get("credentials_file"))
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Google Sheets automation toolkit")
+    subcommands = parser.add_subparsers(dest="command")
+
+    run_parser = subcommands.add_parser("run", help="run named actions from actions.json without prompts")
+    run_parser.add_argument("actions", nargs="+", help="action names, in run order")
+    run_parser.add_argument("--parallel", action="store_true", help="run the actions on the worker pool")
+    run_parser.add_argument("--resume", action="store_true",
+                            help="continue interrupted CSV appends from their journal instead of starting over")
+
+    plan_parser = subcommands.add_parser("plan", help="estimate the API calls and runtime of actions, offline")
+    plan_parser.add_argument("actions", nargs="+", help="action names")
+    plan_parser.add_argument("--existing-rows", type=int, default=1,
+                             help="rows already in the target sheet (default: 1, the header)")
+    plan_parser.add_argument("--existing-cells", type=int, default=0,
+                             help="cells used by the other sheets of the spreadsheet")
+    plan_parser.add_argument("--grid-rows", type=int, default=1000,
+                             help="rows in the target sheet's grid, empty ones included (default: 1000)")
+    plan_parser.add_argument("--grid-cols", type=int, default=26,
+                             help="columns in the target sheet's grid (default: 26)")
+    plan_parser.add_argument("--latency", type=float, default=None, help="seconds per request (default: 0.5)")
+    plan_parser.add_argument("--json", action="store_true", help="print the estimates as JSON")
+
+    backups_parser = subcommands.add_parser("backups", help="list the stored backup versions, offline")
+    backups_parser.add_argument("worksheet", nargs="?", help="worksheet title (default: every backed-up worksheet)")
+
+    restore_parser = subcommands.add_parser("restore", help="write a stored backup version to CSV, offline")
+    restore_parser.add_argument("worksheet", help="worksheet title")
+    restore_parser.add_argument("--version", type=int, default=None, help="version number (default: the newest)")
+    restore_parser.add_argument("--at", default=None,
+                                help="the newest version taken at or before this time, e.g. 2025-01-31T12:00")
+    restore_parser.add_argument("--output", default=None, help="CSV path (default: csv/<worksheet>_v<version>.csv)")
+    return parser.parse_args(argv)
 
+
+def connect(config):
+    """
+    Create the gspread client and session cache, or return (None, None).
+    With `api_endpoint` set (e.g. a local fake server), no credentials are used.
+    """
+    if config.get("api_endpoint"):
+        from src.fake_sheets import local_client
+        client = local_client(config["api_endpoint"], config.get("rate_limits"))
+    else:
+        client = init_gspread_client(config.get("credentials_file"), config.get("rate_limits"))
     if not client:
         print("Google Sheets client not available. Exiting.")
-        return
+        return None, None
+    # Spreadsheet and worksheet metadata shared by every action in this session
+    return client, SheetCache(client, ttl=config.get("cache_ttl", DEFAULT_TTL))
+
+
+def run_headless(config, names, parallel=False, resume=False):
+    """
+    Run named actions with no stdin interaction and return a process exit code.
+    Runs made only of custom scripts never connect to Google.
+    """
+    actions = {action["name"]: action for action in load_actions()}
+    missing = [name for name in names if name not in actions]
+    if missing:
+        print(f"❌ Unknown action(s): {', '.join(missing)}")
+        return runner.EXIT_USAGE
+
+    selected = [actions[name] for name in names]
+    spreadsheet_id = config.get("spreadsheet_id")
+    client = cache = None
+    if any(action.get("action") != "custom_script" for action in selected):
+        if not spreadsheet_id:
+            print("No 'spreadsheet_id' found in config.json. Exiting.")
+            return runner.EXIT_USAGE
+        client, cache = connect(config)
+        if not client:
+            return runner.EXIT_USAGE
+
+    start = time.perf_counter()
+    results = runner.run_actions(
+        client, spreadsheet_id, selected, config,
+        max_workers=None if parallel else 1, cache=cache, resume=resume,
+    )
+    runner.print_summary(results, time.perf_counter() - start)
+    return runner.exit_code(results)
+
+
+def plan_headless(config, args):
+    """
+    Dry-run named actions without connecting to Google and print their cost
+    estimates. Returns EXIT_FAILED if an action cannot be planned or would
+    exceed the spreadsheet cell limit.
+    """
+    from src import dry_run
+
+    actions = {action["name"]: action for action in load_actions()}
+    missing = [name for name in args.actions if name not in actions]
+    if missing:
+        print(f"❌ Unknown action(s): {', '.join(missing)}")
+        return runner.EXIT_USAGE
+
+    latency = dry_run.DEFAULT_LATENCY if args.latency is None else args.latency
+    plans = {}
+    for name in args.actions:
+        plans[name] = dry_run.plan_action(actions[name], config, args.existing_rows, args.existing_cells, latency,
+                                          args.grid_rows, args.grid_cols)
+
+    if args.json:
+        print(json.dumps(plans, indent=2))
+    else:
+        for name, plan in plans.items():
+            if plan:
+                dry_run.print_plan(name, plan)
+
+    ok = all(plan and not plan["over_cell_limit"] for plan in plans.values())
+    return runner.EXIT_OK if ok else runner.EXIT_FAILED
+
+
+def list_backups(config, args):
+    """Print the versions kept for each backed-up worksheet of the spreadsheet."""
+    from datetime import datetime
+    from src import backup_store
+
+    root = os.path.join(config.get("backup_dir", backup_store.DEFAULT_BACKUP_DIR), config.get("spreadsheet_id", ""))
+    if args.worksheet:
+        names = [os.path.basename(backup_store.store_path("", "", args.worksheet))]
+    else:
+        names = sorted(os.listdir(root)) if os.path.isdir(root) else []
+    if not names:
+        print(f"No backups in {root}")
+        return runner.EXIT_FAILED
+
+    for name in names:
+        store = backup_store.BackupStore(os.path.join(root, name))
+        print(f"\n🗄️ {name}: {len(store.versions)} version(s), {store.size():,} bytes")
+        for entry in store.versions:
+            taken = datetime.fromtimestamp(entry["time"]).strftime("%Y-%m-%d %H:%M:%S")
+            print(f"   v{entry['version']:<6} {taken}  {entry['rows']:>8,} rows  {entry['bytes']:>10,} bytes")
+    return runner.EXIT_OK
+
+
+def restore_backup(config, args):
+    """Reconstruct a stored version of a worksheet and write it to CSV."""
+    import csv
+    from datetime import datetime
+    from src import backup_store
+
+    backup_dir = config.get("backup_dir", backup_store.DEFAULT_BACKUP_DIR)
+    store = backup_store.BackupStore(backup_store.store_path(backup_dir, config.get("spreadsheet_id", ""),
+                                                             args.worksheet))
+    version = args.version
+    if args.at:
+        try:
+            version = store.version_at(datetime.fromisoformat(args.at).timestamp())
+        except ValueError as e:
+            print(f"❌ Invalid --at time: {e}")
+            return runner.EXIT_USAGE
+        if version is None:
+            print(f"❌ No backup of '{args.worksheet}' taken at or before {args.at}")
+            return runner.EXIT_FAILED
+
+    try:
+        rows = store.restore(version)
+    except (ValueError, OSError) as e:
+        print(f"❌ Failed to restore '{args.worksheet}': {e}")
+        return runner.EXIT_FAILED
+
+    version = version or store.versions[-1]["version"]
+    output = args.output or os.path.join("csv", f"{os.path.basename(store.root)}_v{version}.csv")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerows(rows)
+    print(f"✅ Restored '{args.worksheet}' version {version} ({len(rows):,} rows) to {output}")
+    return runner.EXIT_OK
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        config = load_config()
+    except (FileNotFoundError, json.JSONDecodeError) as e:
+        print(f"❌ Failed to load config.json: {e}")
+        return runner.EXIT_USAGE
+
+    if args.command == "run":
+        return run_headless(config, args.actions, args.parallel, args.resume)
+    if args.command == "plan":
+        return plan_headless(config, args)
+    if args.command == "backups":
+        return list_backups(config, args)
+    if args.command == "restore":
+        return restore_backup(config, args)
 
     spreadsheet_id = config.get("spreadsheet_id")
     if not spreadsheet_id:
         print("No 'spreadsheet_id' found in config.json. Exiting.")
-        return
+        return runner.EXIT_USAGE
+
+    client, cache = connect(config)
+    if not client:
+        return runner.EXIT_USAGE
 
-    spreadsheet = client.open_by_key(spreadsheet_id)
+    spreadsheet = cache.spreadsheet(spreadsheet_id)
     print(f"Currently managing '{spreadsheet.title}'")
     version = config.get("version", "unknown")
     while True:
@@ -64,6 +263,7 @@ def main():
         print("0. Manage actions (create/edit/delete)")
         for i, action in enumerate(actions, start=1):
             print(f"{i}. {action['name']} ({action['action']})")
+        print("R. Run several actions in parallel")
         print("Q. Quit program")
 
         choice = input("\nChoose an option: ").strip().lower()
@@ -74,7 +274,24 @@ def main():
 
         # Manage actions
         if choice == "0":
-            manage_actions.main(config, client)
+            manage_actions.main(config, client, cache)
+            continue
+
+        # Run a batch of actions on the worker pool
+        if choice == "r":
+            picks = input("Action numbers, comma-separated (blank for all): ").strip()
+            try:
+                indexes = [int(p) - 1 for p in picks.split(",") if p.strip()] if picks else range(len(actions))
+            except ValueError:
+                print("❌ Invalid input. Please enter action numbers.")
+                continue
+            if any(i < 0 or i >= len(actions) for i in indexes):
+                print("❌ Invalid action number.")
+                continue
+            selected = [actions[i] for i in indexes]
+            start = time.perf_counter()
+            results = runner.run_actions(client, spreadsheet_id, selected, config, cache=cache)
+            runner.print_summary(results, time.perf_counter() - start)
             continue
 
         # Run selected action
@@ -90,37 +307,9 @@ def main():
 
         print(f"\n▶ Running action: {selected_action['name']} ({selected_action['action']})")
 
-        action_type = selected_action["action"]
-        if action_type == "append":
-            append.main(client, spreadsheet_id, selected_action, config)
-        elif action_type == "update":
-            from src import update
-            update.main(client, spreadsheet_id, selected_action, config)
-        elif action_type == "custom_script":
-            import importlib.util
-            import os
-
-            script_file = selected_action.get("custom_script")
-            if not script_file:
-                print("❌ No custom script specified in action.")
-                continue
-
-            script_path = os.path.join("custom_script", script_file)
-            if not os.path.exists(script_path):
-                print(f"❌ Custom script not found: {script_path}")
-                continue
-
-            spec = importlib.util.spec_from_file_location("custom_script", script_path)
-            module = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(module)
-
-            if hasattr(module, "main"):
-                print(f"▶ Running custom script: {script_file}")
-                module.main()
-            else:
-                print(f"❌ Script {script_file} does not have a main() function.")
+        runner.run_action(client, spreadsheet_id, selected_action, config, cache)
 
         print("\n✅ Action completed. Returning to main menu...\n")
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
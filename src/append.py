@@ -1,10 +1,291 @@
+import asyncio
+import contextvars
 import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from src.manage_actions import prompt_input
-import gspread
 import webbrowser
-from src.helper import get_start_col, read_csv_with_locale, format_row
+from src.helper import get_start_col, writes_in_flight, AppendedRangeTracker
+from src.batch_requests import FormatBatch
+from src.format_plan import compile_formats
+from src.sheet_cache import SheetCache
+from src.mirror import get_mirror
+from src.progress import Progress
+from src import metrics
 
-def main(client, spreadsheet_id, action,config):
+# Rows read, formatted and sent per values.append request in bulk mode
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def append_stream(worksheet, chunks, col_number, tracker, progress=None, journal=None, offset=0, mirror=None):
+    """
+    Append formatted chunks with one values.append request each.
+
+    `chunks` yields (formatted_rows, row_notes, formats) and may be a lazy
+    generator: chunk N is uploaded on a background thread while chunk N+1
+    is being produced, and at most those two chunks are held in memory.
+    Written rows are recorded in `tracker`. Notes and cell formats are sent
+    after every chunk, in one batchUpdate, so a chunk the journal commits is
+    complete even if a later one fails. Sent rows are reported to `progress`.
+    With a `journal`, every chunk is logged as pending before it is sent and
+    committed after, numbering source rows from `offset`. Appended rows are
+    recorded in `mirror` (a SheetMirror), if given.
+
+    Returns:
+        number of rows appended
+    """
+    format_batch = FormatBatch(worksheet)
+    padding = [""] * (col_number - 1)
+    progress = progress or Progress()
+    calls = 0
+
+    def upload(offset, formatted_rows, row_notes, formats):
+        nonlocal calls
+        if journal:
+            journal.pending(offset, formatted_rows)
+        if padding:
+            formatted_rows = [padding + row for row in formatted_rows]
+        with metrics.stage("write"):
+            response = worksheet.append_rows(formatted_rows, value_input_option="USER_ENTERED")
+        first_row, _ = tracker.record(response)
+        if journal:
+            journal.commit(offset, len(formatted_rows), response["updates"]["updatedRange"])
+        if mirror:
+            mirror.write(worksheet, first_row, 1, formatted_rows)
+
+        for row_offset, notes in enumerate(row_notes):
+            for col_index, note_value in notes:
+                if note_value:
+                    format_batch.add_note(first_row + row_offset, col_index + col_number, note_value)
+        format_batch.add_rows(first_row, len(formatted_rows), col_number, formats)
+        with metrics.stage("format-apply"):
+            calls += format_batch.flush()
+        return len(formatted_rows)
+
+    if mirror:
+        mirror.begin(worksheet)
+    rows_appended = 0
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        pending = None
+        for formatted_rows, row_notes, formats in chunks:
+            if not formatted_rows:
+                continue
+            if pending:
+                sent = pending.result()
+                rows_appended += sent
+                progress.update(sent)
+            # Run the upload in this thread's context so its API calls count toward this action
+            pending = executor.submit(contextvars.copy_context().run, upload, offset, formatted_rows, row_notes, formats)
+            offset += len(formatted_rows)
+        if pending:
+            sent = pending.result()
+            rows_appended += sent
+            progress.update(sent)
+    progress.finish()
+    if mirror and rows_appended:
+        mirror.settle(worksheet)
+    if calls:
+        print(f"🎨 Applied notes and formats in {calls} batch request(s)")
+
+    return rows_appended
+
+
+async def _append_stream_async(worksheet, chunks, col_number, tracker, progress, journal, offset, mirror,
+                               in_flight, start_row):
+    from gspread.utils import absolute_range_name, rowcol_to_a1
+    from src.async_client import AsyncSheetsClient, to_thread
+
+    format_batch = FormatBatch(worksheet)
+    padding = [""] * (col_number - 1)
+    spreadsheet_id = worksheet.spreadsheet_id
+    chunks = iter(chunks)
+    writes = deque()
+    rows_appended = calls = 0
+
+    async with AsyncSheetsClient.for_worksheet(worksheet, max_connections=in_flight) as client:
+
+        async def append(rows):
+            with metrics.stage("write"):
+                return await client.values_append(spreadsheet_id, absolute_range_name(worksheet.title), rows)
+
+        async def update(first_row, rows):
+            last_cell = rowcol_to_a1(first_row + len(rows) - 1, max(len(row) for row in rows))
+            range_name = absolute_range_name(worksheet.title, f"{rowcol_to_a1(first_row, 1)}:{last_cell}")
+            with metrics.stage("write"):
+                response = await client.values_update(spreadsheet_id, range_name, rows)
+            # Shaped like a values.append response for the tracker
+            return {"updates": response}
+
+        async def send_all(bodies):
+            for body in bodies:
+                await client.batch_update(spreadsheet_id, body)
+            return len(bodies)
+
+        async def settle(offset, rows, row_notes, formats, task):
+            nonlocal calls
+            response = await task
+            first_row, _ = tracker.record(response)
+            if journal:
+                journal.commit(offset, len(rows), response["updates"]["updatedRange"])
+            if mirror:
+                mirror.write(worksheet, first_row, 1, rows)
+            for row_offset, notes in enumerate(row_notes):
+                for col_index, note_value in notes:
+                    if note_value:
+                        format_batch.add_note(first_row + row_offset, col_index + col_number, note_value)
+            format_batch.add_rows(first_row, len(rows), col_number, formats)
+            # Like append_stream: a committed chunk gets its notes and formats before the next one
+            with metrics.stage("format-apply"):
+                calls += await send_all(format_batch.take())
+            progress.update(len(rows))
+            return len(rows)
+
+        next_row = start_row
+        grid_rows = added_from = None
+        rows_sent = 0
+        finished = False
+        try:
+            while True:
+                # Parse and format the next chunk on a worker thread while the writes are in flight
+                chunk = await to_thread(next, chunks, None)
+                if chunk is None:
+                    break
+                formatted_rows, row_notes, formats = chunk
+                if not formatted_rows:
+                    continue
+                if journal:
+                    journal.pending(offset, formatted_rows)
+                rows = [padding + row for row in formatted_rows] if padding else formatted_rows
+
+                if next_row is None:
+                    # values.append finds the end of the data; later chunks go to the rows right below it
+                    rows_appended += await settle(offset, rows, row_notes, formats, append(rows))
+                    next_row = tracker.last_row + 1
+                else:
+                    # Unlike values.append, values.update does not grow the grid
+                    last_row = next_row + len(rows) - 1
+                    if grid_rows is None:
+                        grid_rows = await client.row_count(spreadsheet_id, worksheet.id)
+                        # A resumed run trims back to the grid the interrupted run started with
+                        added_from = journal.grid(grid_rows) if journal else grid_rows
+                    if last_row > grid_rows:
+                        # Grow once for every row still expected, or for the writes that fit in flight
+                        expected = progress.total - rows_sent if progress.total else in_flight * len(rows)
+                        extra = next_row + max(expected, len(rows)) - 1 - grid_rows
+                        await client.batch_update(spreadsheet_id, {"requests": [{"appendDimension": {
+                            "sheetId": worksheet.id, "dimension": "ROWS", "length": extra}}]})
+                        grid_rows += extra
+                    writes.append((offset, rows, row_notes, formats, asyncio.ensure_future(update(next_row, rows))))
+                    next_row = last_row + 1
+                    # Commit in sheet order: wait for the oldest write when every slot is busy
+                    while len(writes) >= in_flight or (writes and writes[0][-1].done()):
+                        rows_appended += await settle(*writes.popleft())
+                offset += len(formatted_rows)
+                rows_sent += len(formatted_rows)
+            while writes:
+                rows_appended += await settle(*writes.popleft())
+            finished = True
+        except BaseException:
+            for *_, task in writes:
+                task.cancel()
+            await asyncio.gather(*(task for *_, task in writes), return_exceptions=True)
+            raise
+        finally:
+            # Drop the spare rows added to the grid for rows that never came, after a failure too
+            spare_from = max(added_from or 0, tracker.last_row or 0)
+            if grid_rows is not None and grid_rows > spare_from:
+                trim = {"requests": [{"deleteDimension": {"range": {
+                    "sheetId": worksheet.id, "dimension": "ROWS", "startIndex": spare_from, "endIndex": grid_rows}}}]}
+                if finished:
+                    await client.batch_update(spreadsheet_id, trim)
+                else:
+                    try:
+                        await client.batch_update(spreadsheet_id, trim)
+                    except Exception as e:
+                        print(f"⚠️ Could not remove {grid_rows - spare_from} spare grid rows: {e}")
+    return rows_appended, calls
+
+
+def append_stream_async(worksheet, chunks, col_number, tracker, progress=None, journal=None, offset=0, mirror=None,
+                        in_flight=4, start_row=None):
+    """
+    Like append_stream, but keeps up to `in_flight` chunk writes in flight
+    at once on an AsyncSheetsClient (pooled connections, same quota limiter).
+
+    The first chunk is sent with values.append, unless `start_row` gives the
+    sheet row to continue at. Every later chunk is written with values.update
+    to the rows right below the previous one, so the rows land in CSV order
+    however the requests finish; the grid is grown ahead of the writes and
+    trimmed back afterwards, even if a write fails (to the size recorded in
+    the journal when resuming). Responses are settled in order: tracker, journal
+    commit, mirror, notes and progress see the same sequence as with
+    append_stream. Nothing else should append to the worksheet meanwhile.
+
+    Returns:
+        number of rows appended
+    """
+    progress = progress or Progress()
+    if mirror:
+        mirror.begin(worksheet)
+    rows_appended, calls = asyncio.run(_append_stream_async(
+        worksheet, chunks, col_number, tracker, progress, journal, offset, mirror, in_flight, start_row,
+    ))
+    progress.finish()
+    if mirror and rows_appended:
+        mirror.settle(worksheet)
+    if calls:
+        print(f"🎨 Applied notes and formats in {calls} batch request(s)")
+    return rows_appended
+
+
+def start_journal(action, config, spreadsheet_id, worksheet, csv_path, col_number, resume, interactive,
+                  ranges=False):
+    """
+    Open the write-ahead journal of a CSV append. When resuming (or when the
+    user agrees to resume an unfinished run), settle the batch that was in
+    flight when the last run stopped. `ranges` marks a run that writes its
+    chunks with append_stream_async.
+
+    Resuming without a journal starts a new run; resuming a run that
+    finished is refused.
+
+    Returns:
+        (journal, rows_to_skip, start_row), or (None, None, None) if the
+        last run finished and there is nothing to resume. start_row is the
+        sheet row a resumed run must continue at with append_stream_async
+        (None to append as usual).
+    """
+    from src.journal import Journal, journal_path, source_stamp
+
+    journal = Journal(journal_path(config, spreadsheet_id, action))
+    state = journal.read()
+    unfinished = state is not None and not state["done"]
+    if not resume and interactive and unfinished:
+        resume = prompt_input("The last run of this action did not finish. Resume it? (y/n)", "y").lower() == "y"
+
+    source = source_stamp(csv_path)
+    if resume and state is None:
+        print("ℹ️ No journal to resume from; starting a new run.")
+        resume = False
+    if not resume:
+        journal.start(source, ranges=ranges)
+        return journal, 0, None
+    if not unfinished:
+        # Starting over would append every row a second time
+        print("❌ Nothing to resume: the last run of this action finished. Run it without --resume to append again.")
+        return None, None, None
+    if state["source"] != source:
+        raise ValueError(f"{csv_path} changed since the interrupted run; run without --resume to start over")
+
+    # Chunks written past the last commit of a ranges run may have landed: rewrite them in place
+    start_row = state["last_row"] + 1 if state["ranges"] and state["last_row"] is not None else None
+    journal.start(source, resume=True, ranges=ranges or start_row is not None, grid_rows=state["grid_rows"])
+    skip = journal.recover(worksheet, col_number, state)
+    print(f"⏩ Resuming after {skip} rows already in the sheet")
+    return journal, skip, start_row
+
+
+def main(client, spreadsheet_id, action, config, cache=None, interactive=True, resume=False):
     """
     Execute an 'append' action.
 
@@ -12,6 +293,14 @@ def main(client, spreadsheet_id, action,config):
         client: gspread client
         spreadsheet_id: ID of the spreadsheet
         action: dict from actions.json
+        config: dict from config.json
+        cache: SheetCache shared across actions (a private one is made if omitted)
+        interactive: when False, never read stdin or open a browser, and
+            report progress at a limited rate instead of printing every row
+        resume: continue a CSV append from its journal instead of starting over
+
+    Returns:
+        True if every row was appended, False otherwise
     """
     print("🟢 Append action started")
 
@@ -20,15 +309,20 @@ def main(client, spreadsheet_id, action,config):
     source_type = action.get("source_type", "manual")
     start_col = action.get("start_cell", "A")
     column_total = action.get("column_total", 1)
-    values_length = 0
+    tracker = AppendedRangeTracker()
+    success = True
     locale = action.get("locale") or config.get("locale", "US")
+    plan = compile_formats(action.get("cell_formats", []), locale)
+    cache = cache or SheetCache(client)
+    # Local copy of the sheet, when enabled in config.json
+    mirror = get_mirror(config)
     # Open the spreadsheet and worksheet
     try:
-        spreadsheet = client.open_by_key(spreadsheet_id)
-        worksheet = spreadsheet.worksheet(sheet_name)
+        worksheet = cache.worksheet(spreadsheet_id, sheet_name)
     except Exception as e:
         print(f"❌ Failed to open sheet '{sheet_name}': {e}")
-        return
+        return False
+    format_batch = FormatBatch(worksheet)
 
     # ==========================
     # Mode: CSV
@@ -41,58 +335,128 @@ def main(client, spreadsheet_id, action,config):
 
         if not os.path.exists(csv_path):
             print(f"❌ CSV file not found: {csv_path}")
-            return
+            return False
 
+        journal = None
         try:
-            df = read_csv_with_locale(csv_path, locale)
-            if df is None:
-                return
+            # pandas is only needed for CSV sources
+            from src.csv_reader import read_csv, iter_csv, csv_settings, count_csv_rows, read_header
+            from src.frame_format import format_frame
 
-            values = df.values.tolist()
-            values_length = len(values)
             col_number = get_start_col(action.get("start_cell", "A"))
-            for row in values:
-                # Format row, get notes and formatting metadata
-                formatted_row, notes, formats = format_row(row, action.get("cell_formats", []), locale)
-
-                # Pad row if start column > 1
-                if col_number > 1:
-                    formatted_row = [""] * (col_number - 1) + formatted_row
-
-                print(f"Appending row: {formatted_row}")
-                print(f"Note info row: {notes}")
-                pause = prompt_input("Press Enter to continue...")
-                # Append the row to the worksheet
-                worksheet.append_row(formatted_row, value_input_option="USER_ENTERED")
-
-                # Get the last row number after append
-                last_row = len(worksheet.get_all_values())
-
-                # Apply TAGS notes
-                for col_index, note_value in notes:
-                    if note_value:
-                        cell_label = gspread.utils.rowcol_to_a1(last_row, col_index + col_number)
-                        worksheet.update_note(cell_label, note_value)
-
-                # Apply cell formats
-                for i, cell_format in enumerate(formats):
-                    col_idx = i + col_number
-                    pattern = cell_format.get("pattern")
-                    if pattern:
-                        cell_label = gspread.utils.rowcol_to_a1(last_row, col_idx)
-                        worksheet.format(cell_label, {"numberFormat": {"type": "NUMBER", "pattern": pattern}})
-
-
-
-
-            print(f"✅ Appended {len(values)} rows from {csv_path}")
+            csv_options = csv_settings(action, locale)
+
+            # Incremental mode: skip rows whose key columns are already in the sheet
+            index = None
+            if action.get("incremental", "n") == "y":
+                from src.dedupe import RowIndex, key_positions, index_path
+                positions = key_positions(read_header(csv_path, csv_options["delimiter"]), action.get("dedupe_keys"))
+                index = RowIndex.load(index_path(config, spreadsheet_id, worksheet), positions, col_number)
+                with metrics.stage("dedupe"):
+                    rows_read = index.refresh(worksheet, mirror)
+                print(f"🔎 Dedupe index: {len(index.hashes)} known rows ({rows_read} read from the sheet)")
+
+            # Bulk appends can keep several chunk writes in flight
+            in_flight = writes_in_flight(action, config) if append_mode == "bulk" else 1
+            # Checked before the journal is opened, so a bad value does not discard an unfinished run
+            chunk_size = int(action.get("chunk_size", DEFAULT_CHUNK_SIZE))
+            if append_mode == "bulk" and chunk_size < 1:
+                raise ValueError(f"chunk_size must be at least 1 row, got {chunk_size}")
+
+            # Other CSV appends keep a journal so a failed run can resume instead of re-sending rows;
+            # incremental appends are already safe to re-run
+            skip = 0
+            start_row = None
+            if index is None:
+                journal, skip, start_row = start_journal(action, config, spreadsheet_id, worksheet, csv_path,
+                                                         col_number, resume, interactive, ranges=in_flight > 1)
+                if journal is None:
+                    return False
+
+            if append_mode == "bulk":
+                # Stream the CSV: chunk N uploads while chunk N+1 is parsed
+                frames = iter_csv(csv_path, action.get("cell_formats", []), chunk_size=chunk_size, **csv_options)
+                chunks = (
+                    metrics.timed_call("format", format_frame, chunk, action.get("cell_formats", []), locale)
+                    for chunk in metrics.timed_iter("parse", frames)
+                )
+                if index:
+                    chunks = index.filter_chunks(chunks)
+                elif skip:
+                    from src.journal import skip_rows
+                    chunks = skip_rows(chunks, skip)
+                progress = Progress(total=count_csv_rows(csv_path) - skip)
+                if in_flight > 1 or start_row is not None:
+                    rows_appended = append_stream_async(worksheet, chunks, col_number, tracker, progress, journal,
+                                                        skip, mirror, in_flight, start_row)
+                else:
+                    rows_appended = append_stream(worksheet, chunks, col_number, tracker, progress, journal, skip,
+                                                  mirror)
+                print(f"✅ Appended {rows_appended} rows from {csv_path}")
+            else:
+                with metrics.stage("parse"):
+                    df = read_csv(csv_path, action.get("cell_formats", []), **csv_options)
+                if df is None:
+                    raise ValueError(f"could not read {csv_path}")
+
+                # Format the whole CSV column by column
+                with metrics.stage("format"):
+                    values, row_notes, formats = format_frame(df, action.get("cell_formats", []), locale)
+                if index:
+                    values, row_notes = index.filter(values, row_notes)
+                values, row_notes = values[skip:], row_notes[skip:]
+                progress = Progress(total=len(values))
+                if mirror and values:
+                    mirror.begin(worksheet)
+                for offset, (formatted_row, notes) in enumerate(zip(values, row_notes), start=skip):
+                    if journal:
+                        journal.pending(offset, [formatted_row])
+                    # Pad row if start column > 1
+                    if col_number > 1:
+                        formatted_row = [""] * (col_number - 1) + formatted_row
+
+                    if interactive:
+                        print(f"Appending row: {formatted_row}")
+                        print(f"Note info row: {notes}")
+                        pause = prompt_input("Press Enter to continue...")
+                    # Append the row and read its row number from the response
+                    with metrics.stage("write"):
+                        response = worksheet.append_row(formatted_row, value_input_option="USER_ENTERED")
+                    last_row, _ = tracker.record(response)
+                    if journal:
+                        journal.commit(offset, 1, response["updates"]["updatedRange"])
+                    if mirror:
+                        mirror.write(worksheet, last_row, 1, [formatted_row])
+
+                    # Apply TAGS notes and cell formats in one batchUpdate
+                    format_batch.add_row(last_row, col_number, notes, formats)
+                    with metrics.stage("format-apply"):
+                        format_batch.flush()
+                    if not interactive:
+                        progress.update()
+
+                if not interactive:
+                    progress.finish()
+                if mirror and values:
+                    mirror.settle(worksheet)
+                print(f"✅ Appended {len(values)} rows from {csv_path}")
+
+            if index:
+                index.commit(tracker.last_row)
+                print(f"⏭️ Skipped {index.skipped} rows already in the sheet")
         except Exception as e:
             print(f"❌ Failed to append CSV data: {e}")
-            
+            success = False
+        if journal:
+            journal.finish(success)
+
     # ==========================
     # Mode: Manual
     # ==========================
     elif source_type == "manual":
+        if not interactive:
+            print("❌ Manual append needs keyboard input; use a CSV source for unattended runs.")
+            return False
         print("📝 Manual append mode: input one row at a time. Leave blank to stop.")
         rows_appended = 0
 
@@ -108,36 +472,34 @@ def main(client, spreadsheet_id, action,config):
 
             try:
                 # Format the row and get notes & formatting info
-                formatted_row, notes, formats = format_row(row_values, action.get("cell_formats", []), locale)
+                formatted_row, notes, formats = plan.format_row(row_values)
 
                 # Pad row if start column > 1
                 col_number = get_start_col(action.get("start_cell", "A"))
                 if col_number > 1:
                     formatted_row = [""] * (col_number - 1) + formatted_row
 
-                # Append row
-                worksheet.append_row(formatted_row, value_input_option="USER_ENTERED")
-
-                # Last row index
-                last_row = len(worksheet.get_all_values())
-
-                # Apply TAGS notes
-                for col_index, note_value in notes:
-                    if note_value:
-                        cell_label = gspread.utils.rowcol_to_a1(last_row, col_index + col_number)
-                        worksheet.update_note(cell_label, note_value)
-
-                # Apply cell formats
-                for i, cell_format in enumerate(formats):
-                    pattern = cell_format.get("pattern")
-                    if pattern:
-                        cell_label = gspread.utils.rowcol_to_a1(last_row, i + col_number)
-                        worksheet.format(cell_label, {"numberFormat": {"type": "NUMBER", "pattern": pattern}})
+                # Append row and read its row number from the response; rows are typed
+                # at human speed, so the mirror is checked around each one
+                if mirror:
+                    mirror.begin(worksheet)
+                with metrics.stage("write"):
+                    response = worksheet.append_row(formatted_row, value_input_option="USER_ENTERED")
+                last_row, _ = tracker.record(response)
+                if mirror:
+                    mirror.write(worksheet, last_row, 1, [formatted_row])
+                    mirror.settle(worksheet)
+
+                # Apply TAGS notes and cell formats in one batchUpdate
+                format_batch.add_row(last_row, col_number, notes, formats)
+                with metrics.stage("format-apply"):
+                    format_batch.flush()
 
                 rows_appended += 1
 
             except Exception as e:
                 print(f"❌ Failed to append row: {e}")
+                success = False
                 break
 
         print(f"✅ Finished manual append. Total rows appended: {rows_appended}")
@@ -145,16 +507,18 @@ def main(client, spreadsheet_id, action,config):
 
     else:
         print(f"⚠️ Unsupported source_type '{source_type}'. Only 'csv' or 'manual' allowed.")
-        return
+        return False
 
-    if action.get("open_sheet", "n") == "y":
+    if interactive and action.get("open_sheet", "n") == "y":
         try:
             # Get worksheet GID
             gid = worksheet.id
 
-            # Calculate first newly appended row
-            # If you know how many rows you just appended:
-            first_new_row = len(worksheet.get_all_values()) - values_length + 1
+            # First newly appended row, as reported by the append responses
+            if tracker.first_row is None:
+                print("⚠️ No rows were appended; nothing to open.")
+                return success
+            first_new_row = tracker.first_row
 
             # Construct URL to open at first newly appended row
             sheet_url = f"https://docs.google.com/spreadsheets/d/{spreadsheet_id}/edit#gid={gid}&range=A{first_new_row}"
@@ -165,4 +529,4 @@ def main(client, spreadsheet_id, action,config):
             webbrowser.open(sheet_url)
         except Exception as e:
             print(f"⚠️ Failed to open sheet in browser: {e}")
-    return
\ No newline at end of file
+    return success
@@ -0,0 +1,211 @@
+import asyncio
+import contextvars
+import time
+
+import httpx
+from gspread.utils import absolute_range_name, quote
+
+from src import metrics
+from src.rate_limit import QuotaLimiter, is_idempotent, request_kind, retry_after_seconds, should_retry
+
+SHEETS_API = "https://sheets.googleapis.com"
+SPREADSHEETS_URL = SHEETS_API + "/v4/spreadsheets"
+
+DEFAULT_MAX_CONNECTIONS = 10
+DEFAULT_TIMEOUT = 120.0
+
+
+class AsyncAPIError(Exception):
+    """
+    A Sheets API error response that was not (or no longer) retried. Like
+    gspread's APIError it has `response` and the decoded `error`, so
+    rate_limit.should_retry applies to it.
+    """
+
+    def __init__(self, response):
+        self.response = response
+        self.status_code = response.status_code
+        try:
+            self.error = response.json().get("error", {})
+        except ValueError:
+            self.error = {"message": response.text}
+        super().__init__(f"{self.status_code}: {self.error.get('message', response.text)}")
+
+
+async def to_thread(func, *args):
+    """asyncio.to_thread for Python 3.8: run func(*args) on the default executor, in the caller's context."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, contextvars.copy_context().run, func, *args)
+
+
+def http2_available():
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class AsyncSheetsClient:
+    """
+    asyncio client for the Sheets values and batchUpdate endpoints on an
+    httpx connection pool (keep-alive, and HTTP/2 when the h2 package is
+    installed), so several requests can be in flight at once.
+
+    Requests wait for the same QuotaLimiter tokens as the gspread client,
+    are retried the same way, and are recorded as api.<endpoint> stages of
+    the running action's metrics. Use it as an async context manager.
+    """
+
+    def __init__(self, auth=None, base_url=None, limiter=None, max_connections=DEFAULT_MAX_CONNECTIONS, http2=None):
+        self.auth = auth
+        self.base_url = base_url.rstrip("/") if base_url else None
+        self.limiter = limiter or QuotaLimiter()
+        self.max_connections = max_connections
+        self.http2 = http2_available() if http2 is None else http2
+        self.http = None
+        self.auth_lock = None
+
+    @classmethod
+    def for_worksheet(cls, worksheet, max_connections=DEFAULT_MAX_CONNECTIONS):
+        """
+        Client using the credentials, endpoint and quota limiter of the
+        gspread client that opened `worksheet`.
+        """
+        http_client = worksheet.client
+        session = http_client.session
+        return cls(
+            # gspread keeps the credentials only when it built the session itself
+            auth=getattr(http_client, "auth", None) or getattr(session, "credentials", None),
+            base_url=getattr(session, "base_url", None),
+            limiter=getattr(http_client, "limiter", None),
+            max_connections=max_connections,
+        )
+
+    async def __aenter__(self):
+        self.http = httpx.AsyncClient(
+            http2=self.http2,
+            timeout=DEFAULT_TIMEOUT,
+            limits=httpx.Limits(max_connections=self.max_connections,
+                                max_keepalive_connections=self.max_connections),
+        )
+        self.auth_lock = asyncio.Lock()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.http.aclose()
+
+    async def _headers(self):
+        if self.auth is None:
+            return {}
+        async with self.auth_lock:
+            if not self.auth.valid:
+                from google.auth.transport.requests import Request
+                await to_thread(self.auth.refresh, Request())
+        headers = {}
+        self.auth.apply(headers)
+        return headers
+
+    async def request(self, method, url, params=None, json=None):
+        """
+        Send one request, waiting for a quota token first and retrying
+        failures with backoff under the same rules as the gspread client.
+
+        Returns:
+            the decoded JSON response
+        """
+        if self.base_url and url.startswith(SHEETS_API):
+            url = self.base_url + url[len(SHEETS_API):]
+        kind = request_kind(method)
+        run_metrics = metrics.current()
+        stage = "api." + metrics.endpoint_name(method, url)
+        idempotent = is_idempotent(method, url)
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            # The limiter blocks, so wait for it off the event loop
+            await to_thread(self.limiter.acquire, kind)
+            sent = time.perf_counter()
+            if run_metrics and sent - start > 0.001:
+                run_metrics.observe("api.quota_wait", sent - start)
+
+            response = await self.http.request(method, url, params=params, json=json, headers=await self._headers())
+            failed = response.status_code >= 400
+            if run_metrics:
+                run_metrics.observe(stage, time.perf_counter() - sent, len(response.request.content),
+                                    len(response.content), error=failed)
+            if not failed:
+                return response.json()
+            error = AsyncAPIError(response)
+            if not should_retry(error, idempotent) or attempt >= self.limiter.limits["max_retries"]:
+                raise error
+            if response.status_code == 429:
+                self.limiter.throttle(kind)
+            delay = self.limiter.backoff(attempt, retry_after_seconds(response))
+            print(f"⏳ {response.status_code} from Sheets API, retrying in {delay:.1f}s "
+                  f"(attempt {attempt + 1}/{self.limiter.limits['max_retries']})")
+            if run_metrics:
+                run_metrics.observe("api.retry", delay)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def row_count(self, spreadsheet_id, sheet_id):
+        """Rows in the grid of worksheet `sheet_id`."""
+        response = await self.request("get", f"{SPREADSHEETS_URL}/{spreadsheet_id}",
+                                      params={"fields": "sheets.properties(sheetId,gridProperties.rowCount)"})
+        for sheet in response.get("sheets", []):
+            if sheet["properties"]["sheetId"] == sheet_id:
+                return sheet["properties"]["gridProperties"]["rowCount"]
+        raise ValueError(f"No worksheet with id {sheet_id} in {spreadsheet_id}")
+
+    async def values_get(self, spreadsheet_id, range_name, params=None):
+        return await self.request("get", f"{SPREADSHEETS_URL}/{spreadsheet_id}/values/{quote(range_name)}", params)
+
+    async def values_batch_get(self, spreadsheet_id, ranges, params=None):
+        params = dict(params or {}, ranges=list(ranges))
+        return await self.request("get", f"{SPREADSHEETS_URL}/{spreadsheet_id}/values:batchGet", params)
+
+    async def values_update(self, spreadsheet_id, range_name, values, value_input_option="USER_ENTERED"):
+        return await self.request(
+            "put", f"{SPREADSHEETS_URL}/{spreadsheet_id}/values/{quote(range_name)}",
+            params={"valueInputOption": value_input_option}, json={"values": values},
+        )
+
+    async def values_append(self, spreadsheet_id, range_name, values, value_input_option="USER_ENTERED"):
+        return await self.request(
+            "post", f"{SPREADSHEETS_URL}/{spreadsheet_id}/values/{quote(range_name)}:append",
+            params={"valueInputOption": value_input_option}, json={"values": values},
+        )
+
+    async def values_batch_update(self, spreadsheet_id, data, value_input_option="USER_ENTERED"):
+        return await self.request(
+            "post", f"{SPREADSHEETS_URL}/{spreadsheet_id}/values:batchUpdate",
+            json={"valueInputOption": value_input_option, "data": data},
+        )
+
+    async def batch_update(self, spreadsheet_id, body):
+        return await self.request("post", f"{SPREADSHEETS_URL}/{spreadsheet_id}:batchUpdate", json=body)
+
+
+async def _batch_update_all(worksheet, batches, in_flight, value_input_option):
+    async with AsyncSheetsClient.for_worksheet(worksheet, max_connections=in_flight) as client:
+        slots = asyncio.Semaphore(in_flight)
+
+        async def send(data):
+            data = [dict(block, range=absolute_range_name(worksheet.title, block["range"])) for block in data]
+            async with slots:
+                return await client.values_batch_update(worksheet.spreadsheet_id, data, value_input_option)
+
+        return await asyncio.gather(*(send(data) for data in batches))
+
+
+def batch_update_all(worksheet, batches, in_flight, value_input_option="USER_ENTERED"):
+    """
+    Send one values.batchUpdate per entry of `batches` (each a list of
+    {"range", "values"} blocks on `worksheet`), keeping up to `in_flight`
+    requests in flight. The ranges must not overlap.
+
+    Returns:
+        the responses, in the order of `batches`
+    """
+    return asyncio.run(_batch_update_all(worksheet, batches, in_flight, value_input_option))
@@ -0,0 +1,358 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+import time
+
+from src import metrics
+
+DEFAULT_BACKUP_DIR = "backups"
+
+MANIFEST = "manifest.json"
+
+# Row hashes of the newest version, so a new run does not replay the chain
+HEAD = "head.json.gz"
+
+
+def row_key(row):
+    """
+    Exact fingerprint of a row. Unlike dedupe.row_hash nothing is
+    normalized, so a restore gives back 5.0 and " x" exactly as read.
+    """
+    encoded = json.dumps(row, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.blake2b(encoded.encode("utf-8"), digest_size=12).hexdigest()
+
+
+def diff_ops(parent, hashes):
+    """
+    Describe `hashes` as runs copied from `parent` plus inserted rows, in one
+    pass: each row continues the current copy run if it is the next parent
+    row, starts a new run if it appears anywhere in the parent, and is
+    inserted otherwise. Edits, inserts, deletions and moved blocks all give
+    small deltas.
+
+    Returns:
+        list of ["=", start, end] (parent[start:end]) and ["+", hash, ...] ops
+    """
+    first_index = {}
+    for i, key in enumerate(parent):
+        first_index.setdefault(key, i)
+
+    ops = []
+    for key in hashes:
+        last = ops[-1] if ops else None
+        if last and last[0] == "=" and last[2] < len(parent) and parent[last[2]] == key:
+            last[2] += 1
+        elif key in first_index:
+            start = first_index[key]
+            ops.append(["=", start, start + 1])
+        elif last and last[0] == "+":
+            last.append(key)
+        else:
+            ops.append(["+", key])
+    return ops
+
+
+def apply_ops(parent, ops):
+    """Rebuild the row hashes of a version from its parent's and its ops."""
+    hashes = []
+    for op in ops:
+        if op[0] == "=":
+            hashes.extend(parent[op[1]:op[2]])
+        else:
+            hashes.extend(op[1:])
+    return hashes
+
+
+def retained_versions(versions, now=None, keep_last=None, keep_hourly=None, keep_daily=None):
+    """
+    Pick the versions a retention policy keeps: the newest `keep_last`, the
+    newest version of each of the last `keep_hourly` hours and of each of
+    the last `keep_daily` days. With no policy every version is kept.
+
+    Returns:
+        set of version numbers
+    """
+    if not versions or not any((keep_last, keep_hourly, keep_daily)):
+        return {v["version"] for v in versions}
+    now = time.time() if now is None else now
+    newest_first = sorted(versions, key=lambda v: v["version"], reverse=True)
+
+    kept = {v["version"] for v in newest_first[:keep_last or 0]}
+    for bucket_seconds, count in ((3600, keep_hourly), (86400, keep_daily)):
+        if not count:
+            continue
+        seen = set()
+        for v in newest_first:
+            age_buckets = int((now - v["time"]) // bucket_seconds)
+            bucket = int(v["time"] // bucket_seconds)
+            if age_buckets < count and bucket not in seen:
+                seen.add(bucket)
+                kept.add(v["version"])
+    # The newest version is always kept, so the next run has a parent to diff against
+    kept.add(newest_first[0]["version"])
+    return kept
+
+
+class BackupStore:
+    """
+    Versioned backups of one worksheet: the oldest kept version is stored in
+    full, every later one as a delta against the version before it.
+
+    A version file (v<N>.json.gz) holds its ops (see diff_ops) and the rows
+    its parent does not have, keyed by row_key. manifest.json lists the
+    versions with their time, row count and file size. A run whose rows
+    match the newest version adds nothing.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.manifest = self._load_manifest()
+        self._finish_prune()
+
+    def _load_manifest(self):
+        try:
+            with open(os.path.join(self.root, MANIFEST), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"versions": [], "next_version": 1, "last_checked": None}
+
+    def _save_manifest(self):
+        self._write_json(os.path.join(self.root, MANIFEST), self.manifest)
+
+    @staticmethod
+    def _write_json(path, data, compress=False):
+        temp_path = path + ".tmp"
+        opener = gzip.open if compress else open
+        with opener(temp_path, "wt", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":") if compress else None,
+                      indent=None if compress else 2)
+        os.replace(temp_path, path)
+
+    def _file(self, version):
+        return os.path.join(self.root, f"v{version:06d}.json.gz")
+
+    def _finish_prune(self):
+        """Move rewritten versions of a prune that stopped after saving the manifest into place."""
+        pending = self.manifest.pop("rewritten", None)
+        if pending is None:
+            return
+        for version in pending:
+            if os.path.exists(self._file(version) + ".new"):
+                os.replace(self._file(version) + ".new", self._file(version))
+        self._save_manifest()
+
+    def _head(self):
+        """Row hashes of the newest version, from the head file or by replaying the chain."""
+        newest = self.versions[-1]["version"]
+        try:
+            with gzip.open(os.path.join(self.root, HEAD), "rt", encoding="utf-8") as f:
+                head = json.load(f)
+            if head["version"] == newest:
+                return head["hashes"]
+        except (FileNotFoundError, ValueError, KeyError, OSError):
+            pass
+        hashes = []
+        for _, _, hashes in self.replay():
+            pass
+        return hashes
+
+    def _read_version(self, version):
+        with gzip.open(self._file(version), "rt", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_version(self, version, parent, parent_hashes, rows, hashes, suffix=""):
+        """Write a version as a delta against `parent` (a full copy if None) and return its file size."""
+        ops = diff_ops(parent_hashes, hashes)
+        known = set(parent_hashes)
+        new_rows = {}
+        for key, row in zip(hashes, rows):
+            if key not in known:
+                new_rows[key] = row
+        path = self._file(version) + suffix
+        self._write_json(path, {"version": version, "parent": parent, "ops": ops, "rows": new_rows}, compress=True)
+        return os.path.getsize(path)
+
+    @property
+    def versions(self):
+        return self.manifest["versions"]
+
+    def replay(self, until=None):
+        """
+        Rebuild versions oldest first, yielding (entry, rows, hashes) for each
+        one up to version `until` (all of them if None).
+        """
+        rows_by_key = {}
+        hashes = []
+        for entry in self.versions:
+            if until is not None and entry["version"] > until:
+                return
+            data = self._read_version(entry["version"])
+            hashes = apply_ops(hashes if data["parent"] is not None else [], data["ops"])
+            new_rows = data["rows"]
+            rows_by_key = {key: new_rows[key] if key in new_rows else rows_by_key[key] for key in hashes}
+            yield entry, [rows_by_key[key] for key in hashes], hashes
+
+    def version_at(self, timestamp):
+        """Newest version taken at or before `timestamp` (epoch seconds), or None."""
+        candidates = [v for v in self.versions if v["time"] <= timestamp]
+        return candidates[-1]["version"] if candidates else None
+
+    def restore(self, version=None):
+        """
+        Reconstruct the rows of `version` (the newest if None).
+
+        Returns:
+            list of rows
+        """
+        if not self.versions:
+            raise ValueError(f"No backups in {self.root}")
+        version = version or self.versions[-1]["version"]
+        if version not in {v["version"] for v in self.versions}:
+            raise ValueError(f"Version {version} is not kept in {self.root}")
+        for entry, rows, _ in self.replay(until=version):
+            if entry["version"] == version:
+                return rows
+
+    def add(self, rows, taken=None):
+        """
+        Store `rows` as a new version, unless they match the newest one.
+
+        Returns:
+            the new manifest entry, or None if nothing changed
+        """
+        os.makedirs(self.root, exist_ok=True)
+        taken = time.time() if taken is None else taken
+        hashes = [row_key(row) for row in rows]
+        self.manifest["last_checked"] = taken
+
+        parent = None
+        parent_hashes = []
+        if self.versions:
+            parent_entry = self.versions[-1]
+            if parent_entry.get("digest") == _digest(hashes):
+                self._save_manifest()
+                return None
+            parent = parent_entry["version"]
+            parent_hashes = self._head()
+
+        version = self.manifest["next_version"]
+        size = self._write_version(version, parent, parent_hashes, rows, hashes)
+        entry = {"version": version, "time": taken, "rows": len(rows), "bytes": size, "digest": _digest(hashes)}
+        self.versions.append(entry)
+        self.manifest["next_version"] = version + 1
+        self._save_manifest()
+        self._write_json(os.path.join(self.root, HEAD), {"version": version, "hashes": hashes}, compress=True)
+        return entry
+
+    def prune(self, keep_last=None, keep_hourly=None, keep_daily=None, now=None):
+        """
+        Drop the versions the retention policy does not keep. Kept versions
+        whose parent was dropped are rewritten against the previous kept
+        version (the oldest kept one in full), so every kept version can
+        still be restored. The chain is replayed only up to the last version
+        rewritten.
+
+        Returns:
+            number of versions removed
+        """
+        kept = retained_versions(self.versions, now, keep_last, keep_hourly, keep_daily)
+        if len(kept) == len(self.versions):
+            return 0
+
+        # Only kept versions right after a dropped one need rewriting; past the last of them the
+        # chain is unchanged, so the replay stops there. Retention usually drops the oldest
+        # versions, which rebases the oldest kept one and reads nothing after it.
+        numbers = [v["version"] for v in self.versions]
+        last_rewrite = max(v for i, v in enumerate(numbers) if v in kept and i and numbers[i - 1] not in kept)
+
+        # Rewritten versions are staged as .new files
+        previous = None
+        previous_hashes = []
+        parent = None
+        rewritten = []
+        for entry, rows, hashes in self.replay(until=last_rewrite):
+            if entry["version"] in kept:
+                if parent != previous:
+                    entry["bytes"] = self._write_version(entry["version"], previous, previous_hashes, rows, hashes,
+                                                         suffix=".new")
+                    rewritten.append(entry["version"])
+                previous, previous_hashes = entry["version"], hashes
+            parent = entry["version"]
+
+        # The manifest is the commit point; the .new files are moved into place after it
+        removed = [v for v in self.versions if v["version"] not in kept]
+        self.manifest["versions"] = [v for v in self.versions if v["version"] in kept]
+        self.manifest["rewritten"] = rewritten
+        self._save_manifest()
+        self._finish_prune()
+        for entry in removed:
+            try:
+                os.remove(self._file(entry["version"]))
+            except FileNotFoundError:
+                pass
+        return len(removed)
+
+    def size(self):
+        """Bytes used by the version files."""
+        return sum(v["bytes"] for v in self.versions)
+
+
+def _digest(hashes):
+    return hashlib.blake2b("".join(hashes).encode("ascii"), digest_size=16).hexdigest()
+
+
+def store_path(backup_dir, spreadsheet_id, title):
+    name = re.sub(r"[^\w.-]", "_", title) or "sheet"
+    return os.path.join(backup_dir, spreadsheet_id, name)
+
+
+def main(client, spreadsheet_id, action, config, cache=None, interactive=True):
+    """
+    Execute a 'backup' action: read worksheets in one values.batchGet
+    (formulas as written) and add a version to each worksheet's store under
+    <backup_dir>/<spreadsheet_id>/<worksheet>/, then apply the retention
+    policy (`retention` on the action or `backup_retention` in config.json).
+
+    Returns:
+        True if every worksheet was backed up, False otherwise
+    """
+    from src.sheet_cache import SheetCache
+    from src.snapshot import fetch_values, resolve_titles
+
+    print(f"🟢 Backup action started: {action.get('name')}")
+    backup_dir = action.get("backup_dir") or config.get("backup_dir", DEFAULT_BACKUP_DIR)
+    retention = action.get("retention") or config.get("backup_retention") or {}
+    cache = cache or SheetCache(client)
+
+    try:
+        names = action.get("backup_sheets") or ([action["sheet_name"]] if action.get("sheet_name") else [])
+        titles = resolve_titles(cache, spreadsheet_id, names)
+        with metrics.stage("read"):
+            sheets = fetch_values(cache.spreadsheet(spreadsheet_id), titles, "FORMULA")
+    except Exception as e:
+        print(f"❌ Failed to read worksheets: {e}")
+        return False
+
+    taken = time.time()
+    try:
+        for title in titles:
+            store = BackupStore(store_path(backup_dir, spreadsheet_id, title))
+            with metrics.stage("store"):
+                entry = store.add(sheets.get(title, []), taken)
+            if entry is None:
+                print(f"✅ {title}: unchanged since version {store.versions[-1]['version']}; nothing stored.")
+            else:
+                print(f"✅ {title}: version {entry['version']} ({entry['rows']:,} rows, {entry['bytes']:,} bytes)")
+            with metrics.stage("prune"):
+                removed = store.prune(retention.get("keep_last"), retention.get("keep_hourly"),
+                                      retention.get("keep_daily"))
+            if removed:
+                print(f"🧹 {title}: removed {removed} old version(s); {len(store.versions)} kept, "
+                      f"{store.size():,} bytes")
+    except Exception as e:
+        print(f"❌ Failed to store backup: {e}")
+        return False
+
+    return True
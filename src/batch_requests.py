@@ -0,0 +1,156 @@
+def coalesce_runs(column_runs):
+    """
+    Merge vertical runs of number format patterns into as few rectangles as
+    possible.
+
+    Runs with the same pattern that touch or overlap within a column are
+    joined first, then runs that cover the same rows in neighbouring
+    columns are joined side by side.
+
+    Args:
+        column_runs: dict mapping col -> list of (start_row, end_row, pattern),
+            1-indexed with end_row inclusive
+
+    Returns:
+        list of (start_row, start_col, end_row, end_col, pattern) tuples,
+        with end_row/end_col inclusive
+    """
+    # Pass 1: merge runs within each column
+    runs = {}
+    for col, col_runs in column_runs.items():
+        col_runs = sorted(col_runs)
+        run_start, run_end, run_pattern = col_runs[0]
+        for start_row, end_row, pattern in col_runs[1:]:
+            if start_row <= run_end + 1 and pattern == run_pattern:
+                run_end = max(run_end, end_row)
+                continue
+            runs.setdefault((run_start, run_end, run_pattern), []).append(col)
+            run_start, run_end, run_pattern = start_row, end_row, pattern
+        runs.setdefault((run_start, run_end, run_pattern), []).append(col)
+
+    # Pass 2: join identical runs in adjacent columns
+    rectangles = []
+    for (start_row, end_row, pattern), cols in runs.items():
+        cols.sort()
+        block_start = prev_col = cols[0]
+        for col in cols[1:]:
+            if col == prev_col + 1:
+                prev_col = col
+                continue
+            rectangles.append((start_row, block_start, end_row, prev_col, pattern))
+            block_start = prev_col = col
+        rectangles.append((start_row, block_start, end_row, prev_col, pattern))
+
+    rectangles.sort()
+    return rectangles
+
+
+class FormatBatch:
+    """
+    Collects note writes and number formats for one worksheet and sends them
+    together in a single spreadsheets.batchUpdate call per flush.
+
+    Rows and columns are 1-indexed, like gspread.
+    """
+
+    # Keep each batchUpdate body at a reasonable size
+    MAX_REQUESTS_PER_CALL = 5000
+
+    def __init__(self, worksheet):
+        self.worksheet = worksheet
+        self.requests = []
+        self.column_runs = {}
+
+    def _grid_range(self, row, col, end_row=None, end_col=None):
+        return {
+            "sheetId": self.worksheet.id,
+            "startRowIndex": row - 1,
+            "endRowIndex": end_row or row,
+            "startColumnIndex": col - 1,
+            "endColumnIndex": end_col or col,
+        }
+
+    def add_note(self, row, col, note):
+        """Queue a note for the cell at (row, col)."""
+        self.requests.append({
+            "updateCells": {
+                "range": self._grid_range(row, col),
+                "rows": [{"values": [{"note": note}]}],
+                "fields": "note",
+            }
+        })
+
+    def add_number_format(self, row, col, pattern, end_row=None, end_col=None):
+        """Queue a number format pattern for a cell, or a block up to (end_row, end_col)."""
+        self.requests.append({
+            "repeatCell": {
+                "range": self._grid_range(row, col, end_row, end_col),
+                "cell": {"userEnteredFormat": {"numberFormat": {"type": "NUMBER", "pattern": pattern}}},
+                "fields": "userEnteredFormat.numberFormat",
+            }
+        })
+
+    def _add_run(self, col, start_row, end_row, pattern):
+        runs = self.column_runs.setdefault(col, [])
+        # Rows usually arrive in order, so extend the last run in place
+        if runs and runs[-1][2] == pattern and runs[-1][1] + 1 == start_row:
+            runs[-1] = (runs[-1][0], end_row, pattern)
+        else:
+            runs.append((start_row, end_row, pattern))
+
+    def add_row(self, row, col_number, notes, formats):
+        """
+        Queue the TAGS notes and cell formats returned by format_row for one
+        sheet row. Cell formats are coalesced into ranges on flush.
+        """
+        for col_index, note_value in notes:
+            if note_value:
+                self.add_note(row, col_index + col_number, note_value)
+        self.add_rows(row, 1, col_number, formats)
+
+    def add_rows(self, first_row, row_count, col_number, formats):
+        """Queue the same per-column cell formats for `row_count` rows starting at `first_row`."""
+        for i, cell_format in enumerate(formats):
+            pattern = cell_format.get("pattern")
+            if pattern:
+                self._add_run(i + col_number, first_row, first_row + row_count - 1, pattern)
+
+    def _queue_coalesced_formats(self):
+        for start_row, start_col, end_row, end_col, pattern in coalesce_runs(self.column_runs):
+            self.add_number_format(start_row, start_col, pattern, end_row, end_col)
+        self.column_runs = {}
+
+    def take(self, include_formats=True):
+        """
+        Clear the queue and return it as spreadsheets.batchUpdate bodies, for
+        callers that send them with another client.
+
+        Args:
+            include_formats: when False, only notes and explicit requests are
+                taken and cell formats keep coalescing
+
+        Returns:
+            list of request bodies
+        """
+        if include_formats:
+            self._queue_coalesced_formats()
+        bodies = [{"requests": self.requests[i:i + self.MAX_REQUESTS_PER_CALL]}
+                  for i in range(0, len(self.requests), self.MAX_REQUESTS_PER_CALL)]
+        self.requests = []
+        return bodies
+
+    def flush(self, include_formats=True):
+        """
+        Send all queued requests and clear the queue.
+
+        Args:
+            include_formats: when False, only notes and explicit requests are
+                sent and cell formats keep coalescing until a later flush
+
+        Returns:
+            number of batchUpdate calls sent
+        """
+        bodies = self.take(include_formats)
+        for body in bodies:
+            self.worksheet.spreadsheet.batch_update(body)
+        return len(bodies)
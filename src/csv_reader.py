@@ -0,0 +1,255 @@
+import pandas as pd
+
+# pandas C parser, pandas' pyarrow parser, or the C parser over a memory-mapped file
+ENGINES = ("c", "pyarrow", "mmap")
+
+NUMERIC_TYPES = ("number", "percent", "currency")
+
+
+def locale_separators(locale="US"):
+    """Return the (delimiter, decimal) pair used by CSV exports for a locale."""
+    if (locale or "US").upper() == "US":
+        return ",", "."
+    return ";", ","
+
+
+def csv_settings(action, locale="US"):
+    """
+    Collect the CSV reader options of an action. `csv_engine`, `csv_delimiter`
+    and `csv_decimal` override the engine and the locale defaults.
+    """
+    delimiter, decimal = locale_separators(locale)
+    engine = action.get("csv_engine", "c")
+    if engine not in ENGINES:
+        print(f"⚠️ Unknown csv_engine '{engine}', using 'c'.")
+        engine = "c"
+    return {
+        "engine": engine,
+        "delimiter": action.get("csv_delimiter") or delimiter,
+        "decimal": action.get("csv_decimal") or decimal,
+    }
+
+
+def schema_from_formats(columns, cell_formats, numeric=True):
+    """
+    Map CSV column names to dtypes from cell_formats, by position: number,
+    percent and currency columns are read as float64, everything else as str.
+    With numeric=False every column is read as str.
+    """
+    schema = {}
+    for i, name in enumerate(columns):
+        fmt_type = ""
+        if cell_formats and i < len(cell_formats):
+            fmt_type = cell_formats[i].get("type", "text").lower()
+        schema[name] = "float64" if numeric and fmt_type in NUMERIC_TYPES else str
+    return schema
+
+
+def count_csv_rows(csv_path):
+    """
+    Count data rows by counting line breaks, for progress and ETA only:
+    quoted fields that contain newlines make the count too high.
+    """
+    lines = 0
+    last = b"\n"
+    with open(csv_path, "rb") as f:
+        while block := f.read(1 << 20):
+            lines += block.count(b"\n")
+            last = block[-1:]
+    if last != b"\n":
+        lines += 1
+    return max(lines - 1, 0)
+
+
+def read_header(csv_path, delimiter=","):
+    """Return the CSV column names."""
+    return list(pd.read_csv(csv_path, delimiter=delimiter, nrows=0).columns)
+
+
+def _pandas_options(engine, delimiter, decimal, schema):
+    options = {"delimiter": delimiter, "decimal": decimal, "dtype": schema}
+    if engine == "pyarrow":
+        options["engine"] = "pyarrow"
+    else:
+        options["engine"] = "c"
+        options["memory_map"] = engine == "mmap"
+    return options
+
+
+def read_csv(csv_path, cell_formats=None, engine="c", delimiter=",", decimal="."):
+    """
+    Read a whole CSV with the chosen engine and a schema taken from
+    cell_formats, so pandas does not infer column types.
+
+    If a numeric column holds values that are not numbers, the file is read
+    again with every column as text and format_frame applies the defaults
+    to the cells that do not parse.
+
+    Returns:
+        DataFrame, or None if the file could not be read
+    """
+    try:
+        columns = read_header(csv_path, delimiter)
+        try:
+            schema = schema_from_formats(columns, cell_formats)
+            return pd.read_csv(csv_path, **_pandas_options(engine, delimiter, decimal, schema))
+        except ValueError as e:
+            print(f"⚠️ Numeric column in '{csv_path}' holds text ({e}); reading all columns as text.")
+            numeric_columns = [name for name, dtype in schema.items() if dtype == "float64"]
+            schema = schema_from_formats(columns, cell_formats, numeric=False)
+            df = pd.read_csv(csv_path, **_pandas_options(engine, delimiter, decimal, schema))
+            if decimal != ".":
+                # Let format_frame parse these columns with the locale decimal separator
+                for name in numeric_columns:
+                    df[name] = df[name].str.replace(decimal, ".", regex=False)
+            return df
+    except Exception as e:
+        print(f"❌ Failed to read CSV '{csv_path}' with delimiter '{delimiter}': {e}")
+        return None
+
+
+def _coerce_numeric(chunk, numeric_columns, decimal, csv_path):
+    """
+    Convert the numeric columns of a chunk read as text to float64. A column
+    holding a value that is not a number stays text for this chunk only,
+    with "." as decimal separator, and format_frame applies its default.
+    """
+    for name in numeric_columns:
+        col = chunk[name]
+        if decimal != ".":
+            col = col.str.replace(decimal, ".", regex=False)
+        try:
+            chunk[name] = col.astype("float64")
+        except ValueError as e:
+            print(f"⚠️ Numeric column '{name}' in '{csv_path}' holds text ({e}); reading this chunk as text.")
+            chunk[name] = col
+    return chunk
+
+
+def _iter_pyarrow(csv_path, columns, numeric_columns, delimiter, decimal, block_size):
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+
+    # Empty cells become nulls, read as NaN like the C parser does
+    reader = pa_csv.open_csv(
+        csv_path,
+        read_options=pa_csv.ReadOptions(block_size=block_size),
+        parse_options=pa_csv.ParseOptions(delimiter=delimiter),
+        convert_options=pa_csv.ConvertOptions(column_types={name: pa.string() for name in columns},
+                                              strings_can_be_null=True),
+    )
+    for batch in reader:
+        arrays = batch.columns
+        for name in numeric_columns:
+            i = batch.schema.get_field_index(name)
+            col = arrays[i]
+            if decimal != ".":
+                col = pc.replace_substring(col, decimal, ".")
+            # Converted inside Arrow, so numeric columns never go through Python strings
+            try:
+                arrays[i] = pc.cast(col, pa.float64())
+            except pa.ArrowInvalid as e:
+                print(f"⚠️ Numeric column '{name}' in '{csv_path}' holds text ({e}); reading this chunk as text.")
+                arrays[i] = col
+        yield pa.RecordBatch.from_arrays(arrays, names=batch.schema.names).to_pandas()
+
+
+class _RecordSeeker:
+    """
+    Byte offsets of CSV records, for starting a reader part way through a
+    file: lines are read and their quotes counted, so quoted newlines do not
+    end a record and blank lines are not records, as in the C parser. Only
+    moves forward, so every byte is read once however often it is asked.
+    """
+
+    def __init__(self, csv_path):
+        self.file = open(csv_path, "rb")
+        self.records = 0
+
+    def offset(self, records):
+        """Byte offset where record number `records` starts (the header is record 0)."""
+        quoted = False
+        while self.records < records:
+            line = self.file.readline()
+            if not line:
+                break
+            if not quoted and not line.strip(b"\r\n"):
+                continue
+            quoted ^= line.count(b'"') % 2 == 1
+            if not quoted:
+                self.records += 1
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+def _iter_pandas(csv_path, columns, cell_formats, numeric_columns, engine, delimiter, decimal, chunk_size):
+    schema = schema_from_formats(columns, cell_formats)
+    text_schema = schema_from_formats(columns, cell_formats, numeric=False)
+    rows_read = 0
+    seeker = None
+
+    def read(f, dtypes, **options):
+        options.update(_pandas_options(engine, delimiter, decimal, dtypes))
+        if rows_read:
+            # Not from the start of the file: no header, and no memory map (it would start at byte 0)
+            f.seek(seeker.offset(rows_read + 1))
+            options.update(header=None, names=columns, memory_map=False)
+            return pd.read_csv(f, **options)
+        return pd.read_csv(csv_path, **options)
+
+    try:
+        while True:
+            with open(csv_path, "rb") as f:
+                try:
+                    with read(f, schema, chunksize=chunk_size) as reader:
+                        for chunk in reader:
+                            rows_read += len(chunk)
+                            yield chunk
+                    return
+                except ValueError:
+                    # A reader cannot go on after a failed chunk: read that one as text, then start over after it
+                    seeker = seeker or _RecordSeeker(csv_path)
+                    f.seek(0)
+                    chunk = read(f, text_schema, nrows=chunk_size)
+            if chunk.empty:
+                return
+            rows_read += len(chunk)
+            yield _coerce_numeric(chunk, numeric_columns, decimal, csv_path)
+    finally:
+        if seeker:
+            seeker.close()
+
+
+def iter_csv(csv_path, cell_formats=None, engine="c", delimiter=",", decimal=".", chunk_size=1000):
+    """
+    Stream a CSV as DataFrames, so only one chunk is held in memory at a time.
+
+    The C and mmap engines yield exactly `chunk_size` rows per chunk. The
+    pyarrow engine reads byte blocks sized from the first data row, so its
+    chunks hold roughly `chunk_size` rows.
+
+    Numeric columns are parsed as float64. A chunk where one of them holds a
+    value that is not a number is read again as text (the C engines) or keeps
+    that column as text (pyarrow), so it does not abort the import and the
+    following chunks are parsed as numbers again. Empty cells are NaN with
+    every engine.
+    """
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size must be at least 1 row, got {chunk_size}")
+    columns = read_header(csv_path, delimiter)
+    numeric_columns = [name for name, dtype in schema_from_formats(columns, cell_formats).items()
+                       if dtype == "float64"]
+
+    if engine == "pyarrow":
+        with open(csv_path, "rb") as f:
+            f.readline()
+            row_bytes = max(len(f.readline()), 1)
+        yield from _iter_pyarrow(csv_path, columns, numeric_columns, delimiter, decimal,
+                                 max(row_bytes * chunk_size, 1 << 16))
+        return
+
+    yield from _iter_pandas(csv_path, columns, cell_formats, numeric_columns, engine, delimiter, decimal,
+                            chunk_size)
@@ -0,0 +1,168 @@
+import hashlib
+import json
+import os
+
+import gspread
+
+from src.helper import normalize_cell
+
+DEFAULT_CACHE_DIR = "cache"
+
+
+def row_hash(values):
+    """Fingerprint of a list of cell values."""
+    joined = "\x1f".join(normalize_cell(value) for value in values)
+    return hashlib.blake2b(joined.encode("utf-8"), digest_size=12).hexdigest()
+
+
+def key_positions(columns, dedupe_keys=None):
+    """
+    Map `dedupe_keys` (CSV column names) to column positions. No keys means
+    the whole row is the key.
+    """
+    if not dedupe_keys:
+        return list(range(len(columns)))
+    missing = [key for key in dedupe_keys if key not in columns]
+    if missing:
+        raise ValueError(f"dedupe_keys not found in CSV header: {', '.join(missing)}")
+    return [columns.index(key) for key in dedupe_keys]
+
+
+def index_path(config, spreadsheet_id, worksheet):
+    cache_dir = config.get("cache_dir", DEFAULT_CACHE_DIR)
+    return os.path.join(cache_dir, "dedupe", f"{spreadsheet_id}_{worksheet.id}.json")
+
+
+class RowIndex:
+    """
+    Hashes of the key columns of every row already in a worksheet, kept in a
+    local JSON file so each run only reads the rows added since the last one.
+
+    The index remembers the last row it has seen and that row's hash. A
+    refresh reads the key columns from that row down in one request; if the
+    remembered row changed (rows were deleted or the sheet was cleared), the
+    index is rebuilt from the whole range instead.
+    """
+
+    def __init__(self, path, positions, col_number):
+        self.path = path
+        self.positions = positions
+        self.col_number = col_number
+        self.hashes = set()
+        self.last_row = 0
+        self.last_hash = None
+        self.skipped = 0
+        self.last_kept = None
+
+    @property
+    def signature(self):
+        return {"positions": self.positions, "col_number": self.col_number}
+
+    @classmethod
+    def load(cls, path, positions, col_number):
+        """Load the index at `path`, or start an empty one if it is missing or was built for other keys."""
+        index = cls(path, positions, col_number)
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return index
+        if data.get("signature") == index.signature:
+            index.hashes = set(data["hashes"])
+            index.last_row = data["last_row"]
+            index.last_hash = data["last_hash"]
+        return index
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        data = {
+            "signature": self.signature,
+            "last_row": self.last_row,
+            "last_hash": self.last_hash,
+            "hashes": sorted(self.hashes),
+        }
+        with open(self.path, "w") as f:
+            json.dump(data, f)
+
+    def key(self, row):
+        return row_hash([row[i] if i < len(row) else "" for i in self.positions])
+
+    def _read(self, worksheet, start_row, mirror=None):
+        first = min(self.positions)
+        last = max(self.positions)
+        if mirror:
+            rows = mirror.rows(worksheet, start_row, None, self.col_number + first, self.col_number + last)
+            return [[""] * first + list(row) for row in rows]
+        last_col_letter = gspread.utils.rowcol_to_a1(1, self.col_number + last)[:-1]
+        # Open-ended range: from start_row down to the last row with data
+        cell_range = f"{gspread.utils.rowcol_to_a1(start_row, self.col_number + first)}:{last_col_letter}"
+        rows = worksheet.get_values(
+            cell_range,
+            value_render_option="FORMULA",
+            date_time_render_option="FORMATTED_STRING",
+        )
+        # Shift sheet cells back to CSV column positions
+        return [[""] * first + list(row) for row in rows]
+
+    def refresh(self, worksheet, mirror=None):
+        """
+        Add the rows written to the sheet since the last run. With a `mirror`
+        (a SheetMirror) the rows are read from the local mirror.
+
+        Returns:
+            number of sheet rows read
+        """
+        if mirror:
+            mirror.refresh(worksheet)
+        start_row = max(self.last_row, 1)
+        rows = self._read(worksheet, start_row, mirror)
+        if self.last_row and (not rows or self.key(rows[0]) != self.last_hash):
+            print("🔁 Sheet changed since the dedupe index was built; rebuilding it.")
+            self.hashes = set()
+            self.last_row = 0
+            start_row = 1
+            rows = self._read(worksheet, start_row, mirror)
+
+        for row in rows:
+            self.hashes.add(self.key(row))
+        if rows:
+            self.last_row = start_row + len(rows) - 1
+            self.last_hash = self.key(rows[-1])
+        return len(rows)
+
+    def filter(self, formatted_rows, row_notes):
+        """
+        Drop rows whose key is already in the sheet or earlier in this run,
+        and mark the kept rows as seen. Nothing is saved until commit().
+
+        Returns:
+            (formatted_rows, row_notes) for the new rows only
+        """
+        kept_rows, kept_notes = [], []
+        for row, notes in zip(formatted_rows, row_notes):
+            row_key = self.key(row)
+            if row_key in self.hashes:
+                self.skipped += 1
+                continue
+            self.hashes.add(row_key)
+            kept_rows.append(row)
+            kept_notes.append(notes)
+            self.last_kept = row
+        return kept_rows, kept_notes
+
+    def filter_chunks(self, chunks):
+        """filter() for a stream of (formatted_rows, row_notes, formats) chunks."""
+        for formatted_rows, row_notes, formats in chunks:
+            formatted_rows, row_notes = self.filter(formatted_rows, row_notes)
+            yield formatted_rows, row_notes, formats
+
+    def commit(self, last_row):
+        """
+        Save the index after every kept row was appended, the last one at
+        sheet row `last_row`. Call it only after a successful run: if a run
+        fails, the next refresh picks up whatever did reach the sheet.
+        """
+        if self.last_kept is not None and last_row is not None:
+            self.last_row = last_row
+            self.last_hash = self.key(self.last_kept)
+        self.save()
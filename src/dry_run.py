@@ -0,0 +1,247 @@
+import contextlib
+import io
+import json
+import tempfile
+
+import gspread
+
+from src import runner
+from src.progress import format_seconds
+from src.rate_limit import DEFAULT_LIMITS
+
+# Google Sheets allows at most 10 million cells per spreadsheet
+CELL_LIMIT = 10_000_000
+
+# Assumed round trip of one Sheets API request, in seconds
+DEFAULT_LATENCY = 0.5
+
+# Grid of a new worksheet: the cell limit counts every cell of it, used or not
+DEFAULT_GRID_ROWS = 1000
+DEFAULT_GRID_COLS = 26
+
+
+class CallLog:
+    """Records the Sheets API requests an action would make, with their body sizes."""
+
+    def __init__(self):
+        self.calls = []
+
+    def record(self, kind, endpoint, body=None):
+        size = len(json.dumps(body, default=str)) if body is not None else 0
+        self.calls.append({"kind": kind, "endpoint": endpoint, "bytes": size})
+
+    def count(self, kind=None, endpoint=None):
+        return sum(1 for call in self.calls
+                   if (kind is None or call["kind"] == kind) and (endpoint is None or call["endpoint"] == endpoint))
+
+    def bytes(self):
+        return sum(call["bytes"] for call in self.calls)
+
+
+class OfflineWorksheet:
+    """
+    Stands in for a gspread Worksheet: records each request instead of
+    sending it, and answers values.append like the API would. The grid
+    starts at `row_count` × `col_count` and grows to fit the writes.
+    """
+
+    def __init__(self, log, spreadsheet, title="Sheet1", existing_rows=1, row_count=DEFAULT_GRID_ROWS,
+                 col_count=DEFAULT_GRID_COLS):
+        self.log = log
+        self.spreadsheet = spreadsheet
+        self.id = 0
+        self.title = title
+        self.next_row = existing_rows + 1
+        self.max_row = existing_rows
+        self.max_col = 0
+        self.row_count = max(row_count, existing_rows)
+        self.col_count = col_count
+        self.cells_written = 0
+
+    def _touch(self, last_row, last_col, cells):
+        self.max_row = max(self.max_row, last_row)
+        self.max_col = max(self.max_col, last_col)
+        self.row_count = max(self.row_count, last_row)
+        self.col_count = max(self.col_count, last_col)
+        self.cells_written += cells
+
+    def append_rows(self, values, value_input_option="RAW", **kwargs):
+        self.log.record("write", "values.append", {"values": values})
+        first_row = self.next_row
+        last_row = first_row + len(values) - 1
+        last_col = max((len(row) for row in values), default=1)
+        self.next_row = last_row + 1
+        self._touch(last_row, last_col, sum(len(row) for row in values))
+        updated_range = (
+            f"'{self.title}'!{gspread.utils.rowcol_to_a1(first_row, 1)}:"
+            f"{gspread.utils.rowcol_to_a1(last_row, last_col)}"
+        )
+        return {"updates": {"updatedRange": updated_range}}
+
+    def append_row(self, values, value_input_option="RAW", **kwargs):
+        return self.append_rows([values], value_input_option)
+
+    def get_values(self, range_name=None, **kwargs):
+        # The offline sheet holds no data, so incremental appends plan every row
+        self.log.record("read", "values.get")
+        return []
+
+    def batch_get(self, ranges, **kwargs):
+        # Diff updates see an empty block, so they plan a full write
+        self.log.record("read", "values.batchGet")
+        return [[] for _ in ranges]
+
+    def batch_update(self, data, value_input_option="RAW", **kwargs):
+        self.log.record("write", "values.batchUpdate", {"valueInputOption": value_input_option, "data": data})
+        for block in data:
+            first_row, first_col = gspread.utils.a1_to_rowcol(block["range"].split(":")[0])
+            rows = block["values"]
+            last_col = first_col + max((len(row) for row in rows), default=1) - 1
+            self._touch(first_row + len(rows) - 1, last_col, sum(len(row) for row in rows))
+
+
+class OfflineSpreadsheet:
+    def __init__(self, log, spreadsheet_id, sheet_name="Sheet1", existing_rows=1, grid=None):
+        self.log = log
+        self.id = spreadsheet_id
+        self.title = "dry run"
+        self.sheet = OfflineWorksheet(log, self, sheet_name, existing_rows, *(grid or ()))
+        self.notes = 0
+        self.formatted_cells = 0
+
+    def worksheets(self):
+        self.log.record("read", "spreadsheets.get")
+        return [self.sheet]
+
+    def batch_update(self, body):
+        self.log.record("write", "spreadsheets.batchUpdate", body)
+        for request in body["requests"]:
+            if "updateCells" in request:
+                self.notes += 1
+            elif "repeatCell" in request:
+                grid = request["repeatCell"]["range"]
+                self.formatted_cells += ((grid["endRowIndex"] - grid["startRowIndex"])
+                                         * (grid["endColumnIndex"] - grid["startColumnIndex"]))
+
+
+class OfflineClient:
+    """
+    gspread client stand-in whose spreadsheets only record requests. Each
+    spreadsheet holds a single worksheet named `sheet_name`, with a grid of
+    `grid` (rows, columns) if given.
+    """
+
+    def __init__(self, log, sheet_name="Sheet1", existing_rows=1, grid=None):
+        self.log = log
+        self.sheet_name = sheet_name
+        self.existing_rows = existing_rows
+        self.grid = grid
+        self.spreadsheets = {}
+
+    def open_by_key(self, key):
+        self.log.record("read", "spreadsheets.get")
+        if key not in self.spreadsheets:
+            self.spreadsheets[key] = OfflineSpreadsheet(self.log, key, self.sheet_name, self.existing_rows,
+                                                         self.grid)
+        return self.spreadsheets[key]
+
+
+def quota_seconds(requests, per_minute, project_per_minute):
+    """
+    Seconds spent waiting for quota tokens to send `requests` requests, with
+    the same burst size and refill rate as the TokenBucket pair in rate_limit.
+    """
+    rate = min(per_minute, project_per_minute)
+    burst = min(max(1, int(per_minute // 6)), max(1, int(project_per_minute // 6)))
+    return max(0, requests - burst) * 60.0 / rate
+
+
+def estimate(log, sheet, limits=None, latency=DEFAULT_LATENCY, existing_cells=0):
+    """
+    Turn the recorded requests into a cost estimate.
+
+    Returns:
+        dict with request counts, payload bytes, cells touched, predicted
+        runtime and the quota / cell limit checks
+    """
+    limits = dict(DEFAULT_LIMITS, **(limits or {}))
+    reads = log.count("read")
+    writes = log.count("write")
+    read_wait = quota_seconds(reads, limits["read_per_minute"], limits["project_read_per_minute"])
+    write_wait = quota_seconds(writes, limits["write_per_minute"], limits["project_write_per_minute"])
+    # One worker sends requests back to back; quota waits overlap with round trips
+    seconds = max((reads + writes) * latency, read_wait + write_wait)
+
+    spreadsheet = sheet.spreadsheet
+    # The limit counts the whole grid, including the empty cells around the data
+    grid_cells = sheet.row_count * sheet.col_count
+    return {
+        "reads": reads,
+        "writes": writes,
+        "requests": {endpoint: log.count(endpoint=endpoint)
+                     for endpoint in dict.fromkeys(call["endpoint"] for call in log.calls)},
+        "payload_bytes": log.bytes(),
+        "cells_written": sheet.cells_written,
+        "notes": spreadsheet.notes,
+        "formatted_cells": spreadsheet.formatted_cells,
+        "rows": sheet.max_row,
+        "grid_cells": grid_cells,
+        "seconds": seconds,
+        "throttled": read_wait + write_wait > (reads + writes) * latency,
+        "over_cell_limit": existing_cells + grid_cells > CELL_LIMIT,
+    }
+
+
+def plan_action(action, config, existing_rows=1, existing_cells=0, latency=DEFAULT_LATENCY,
+                grid_rows=DEFAULT_GRID_ROWS, grid_cols=DEFAULT_GRID_COLS):
+    """
+    Run an append or update action against an offline worksheet: the CSV is
+    read and formatted and every request is built exactly as in a real run,
+    but nothing is sent.
+
+    Args:
+        existing_rows: rows already in the target worksheet (appends go below them)
+        existing_cells: cells used by the other worksheets, for the 10M cell check
+        grid_rows, grid_cols: grid size of the target worksheet before the run
+
+    Returns:
+        estimate dict, or None if the action cannot be planned
+    """
+    if action.get("action") not in ("append", "update"):
+        print(f"⚠️ '{action.get('name')}' is a {action.get('action')} action; only append and update can be planned.")
+        return None
+    if runner.needs_input(action):
+        print(f"⚠️ '{action.get('name')}' needs keyboard input; only CSV sources can be planned.")
+        return None
+
+    log = CallLog()
+    client = OfflineClient(log, action.get("sheet_name") or "Sheet1", existing_rows, (grid_rows, grid_cols))
+    output = io.StringIO()
+    # Local state such as dedupe indexes and metrics goes to a scratch directory; the offline
+    # worksheet has no revision to check, so the sheet mirror stays off
+    with tempfile.TemporaryDirectory() as cache_dir, contextlib.redirect_stdout(output):
+        scratch = dict(config, cache_dir=cache_dir, metrics_dir=cache_dir, mirror="n")
+        # Concurrent writes need a real HTTP client, so the plan is made for one write at a time
+        ok = runner.run_action(client, "dry-run", dict(action, in_flight=1), scratch, interactive=False)
+    if not ok:
+        print(output.getvalue().rstrip())
+        print(f"❌ Could not plan '{action.get('name')}'.")
+        return None
+
+    sheet = client.spreadsheets["dry-run"].sheet
+    return estimate(log, sheet, config.get("rate_limits"), latency, existing_cells)
+
+
+def print_plan(name, plan):
+    """Print a cost estimate from plan_action."""
+    print(f"\n📋 Dry run: {name}")
+    print(f"   Requests: {plan['reads']} read, {plan['writes']} write — "
+          + ", ".join(f"{endpoint} ×{count}" for endpoint, count in plan["requests"].items()))
+    print(f"   Payload:  {plan['payload_bytes'] / 1_000_000:,.2f} MB")
+    print(f"   Cells:    {plan['cells_written']:,} values, {plan['notes']:,} notes, "
+          f"{plan['formatted_cells']:,} formatted")
+    print(f"   Sheet:    {plan['rows']:,} rows, {plan['grid_cells']:,} cells in the grid")
+    print(f"   Runtime:  ~{format_seconds(plan['seconds'])}"
+          + (" (limited by the rate limiter)" if plan["throttled"] else ""))
+    if plan["over_cell_limit"]:
+        print(f"   ⚠️ Exceeds the {CELL_LIMIT:,} cell limit per spreadsheet")
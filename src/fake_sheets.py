@@ -0,0 +1,566 @@
+"""
+Local stand-in for the Google Sheets v4 and Drive export endpoints used by
+this toolkit, for load and latency tests without touching Google.
+
+Run it on localhost:
+    python -m src.fake_sheets --port 8765 --latency 0.05 --error-rate 0.01
+
+and set "api_endpoint": "http://127.0.0.1:8765" in config.json, or start it
+in-process with FakeSheetsServer and build a client with local_client().
+"""
+import argparse
+import csv
+import io
+import json
+import random
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import requests
+
+GOOGLE_HOSTS = ("https://sheets.googleapis.com", "https://www.googleapis.com", "https://docs.google.com")
+
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+CELL_REF = re.compile(r"([A-Za-z]*)([0-9]*)")
+CELLS = re.compile(r"[A-Za-z]{1,3}[0-9]*(:[A-Za-z]{0,3}[0-9]*)?|[0-9]+:[0-9]+")
+
+
+def column_number(letters):
+    number = 0
+    for char in letters.upper():
+        number = number * 26 + ord(char) - ord("A") + 1
+    return number
+
+
+def column_letters(number):
+    letters = ""
+    while number:
+        number, rest = divmod(number - 1, 26)
+        letters = chr(ord("A") + rest) + letters
+    return letters
+
+
+def parse_range(range_name):
+    """
+    Split an A1 range such as "'Main'!A5:C", "Main!B:B" or "Main" into the
+    sheet title and 1-indexed (first_row, first_col, last_row, last_col);
+    open ends are None.
+    """
+    title, _, cells = range_name.rpartition("!")
+    if not title and not CELLS.fullmatch(cells):
+        # A bare name is a sheet title; a bare A1 range is on the first sheet
+        title, cells = cells, ""
+    if title.startswith("'") and title.endswith("'"):
+        title = title[1:-1].replace("''", "'")
+    if not cells:
+        return title, (1, 1, None, None)
+
+    start, _, end = cells.partition(":")
+    start_col, start_row = CELL_REF.fullmatch(start).groups()
+    if not end:
+        end = start
+    end_col, end_row = CELL_REF.fullmatch(end).groups()
+    return title, (
+        int(start_row) if start_row else 1,
+        column_number(start_col) if start_col else 1,
+        int(end_row) if end_row else None,
+        column_number(end_col) if end_col else None,
+    )
+
+
+def a1_range(title, first_row, first_col, last_row, last_col):
+    quoted = "'" + title.replace("'", "''") + "'"
+    return f"{quoted}!{column_letters(first_col)}{first_row}:{column_letters(last_col)}{last_row}"
+
+
+def render(value, option):
+    """Render a stored cell for values.get: FORMATTED_VALUE returns strings."""
+    if option in ("FORMULA", "UNFORMATTED_VALUE"):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+class FakeSheet:
+    def __init__(self, sheet_id, title, rows=None):
+        self.id = sheet_id
+        self.title = title
+        self.rows = [list(row) for row in rows or []]
+        self.notes = {}
+
+    def properties(self, index):
+        width = max((len(row) for row in self.rows), default=0)
+        return {
+            "sheetId": self.id,
+            "title": self.title,
+            "index": index,
+            "sheetType": "GRID",
+            "gridProperties": {"rowCount": max(1000, len(self.rows)), "columnCount": max(26, width)},
+        }
+
+    def read(self, bounds, option="FORMATTED_VALUE"):
+        first_row, first_col, last_row, last_col = bounds
+        rows = self.rows[first_row - 1:last_row]
+        values = [[render(v, option) for v in row[first_col - 1:last_col]] for row in rows]
+        # Like the API, drop trailing empty cells and rows
+        values = [row[:max((i + 1 for i, v in enumerate(row) if v not in ("", None)), default=0)] for row in values]
+        while values and not values[-1]:
+            values.pop()
+        return values
+
+    def write(self, first_row, first_col, values):
+        for i, row in enumerate(values):
+            index = first_row - 1 + i
+            while len(self.rows) <= index:
+                self.rows.append([])
+            target = self.rows[index]
+            end = first_col - 1 + len(row)
+            if len(target) < end:
+                target.extend([""] * (end - len(target)))
+            target[first_col - 1:end] = row
+        while self.rows and not any(v not in ("", None) for v in self.rows[-1]):
+            self.rows.pop()
+        return sum(len(row) for row in values)
+
+
+class FakeSpreadsheet:
+    def __init__(self, spreadsheet_id, title="Fake spreadsheet"):
+        self.id = spreadsheet_id
+        self.title = title
+        self.sheets = []
+        self.touch()
+
+    def touch(self):
+        self.modified = datetime.now(timezone.utc)
+        self.version = getattr(self, "version", 0) + 1
+
+    def add_sheet(self, title, rows=None):
+        sheet = FakeSheet(len(self.sheets), title, rows)
+        self.sheets.append(sheet)
+        return sheet
+
+    def sheet(self, title=None, gid=None):
+        for sheet in self.sheets:
+            if (gid is not None and sheet.id == gid) or (gid is None and (not title or sheet.title == title)):
+                return sheet
+        raise KeyError(f"Unable to parse range: {title}")
+
+    def metadata(self):
+        return {
+            "spreadsheetId": self.id,
+            "properties": {"title": self.title, "locale": "en_US", "timeZone": "Etc/GMT"},
+            "sheets": [{"properties": sheet.properties(i)} for i, sheet in enumerate(self.sheets)],
+            "spreadsheetUrl": f"https://docs.google.com/spreadsheets/d/{self.id}/edit",
+        }
+
+    def export(self, fmt, gid=None):
+        """Export one sheet (csv) or the whole spreadsheet (xlsx), as bytes."""
+        if fmt == "csv":
+            out = io.StringIO()
+            csv.writer(out).writerows(self.sheet(gid=gid).rows if gid is not None else self.sheets[0].rows)
+            return out.getvalue().encode("utf-8"), "text/csv"
+
+        from openpyxl import Workbook
+
+        workbook = Workbook(write_only=True)
+        for sheet in self.sheets:
+            worksheet = workbook.create_sheet(sheet.title)
+            for row in sheet.rows:
+                worksheet.append(row)
+        out = io.BytesIO()
+        workbook.save(out)
+        return out.getvalue(), XLSX_MIME
+
+
+class QuotaWindow:
+    """Requests allowed per rolling 60 seconds, like the Sheets per-user quota."""
+
+    def __init__(self, per_minute):
+        self.per_minute = per_minute
+        self.times = deque()
+
+    def allow(self, now):
+        if not self.per_minute:
+            return True
+        while self.times and now - self.times[0] >= 60:
+            self.times.popleft()
+        if len(self.times) >= self.per_minute:
+            return False
+        self.times.append(now)
+        return True
+
+
+class FakeHTTPServer(ThreadingHTTPServer):
+    # Concurrent clients open several connections at once; the default backlog of 5 drops some
+    request_queue_size = 128
+    daemon_threads = True
+
+
+class FakeSheetsServer:
+    """
+    Threaded localhost HTTP server answering the Sheets v4 values, batchUpdate
+    and metadata endpoints, Drive file metadata and the spreadsheet export URL.
+
+    Args:
+        latency: seconds added to every response
+        jitter: extra random latency, up to this many seconds
+        read_per_minute / write_per_minute: quota; requests over it get 429
+        error_rate: probability of answering any request with an injected error
+        error_status: HTTP status of the injected errors (429, or e.g. 503)
+        retry_after: Retry-After header sent with 429s (None to omit)
+        port: 0 picks a free port
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, read_per_minute=None, write_per_minute=None,
+                 error_rate=0.0, retry_after=None, port=0, seed=None, error_status=429):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.quota = {"read": QuotaWindow(read_per_minute), "write": QuotaWindow(write_per_minute)}
+        self.spreadsheets = {}
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+        server = self
+
+        class Handler(FakeSheetsHandler):
+            fake = server
+
+        self.httpd = FakeHTTPServer(("127.0.0.1", port), Handler)
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def add_spreadsheet(self, spreadsheet_id, title="Fake spreadsheet", sheets=None):
+        """Create a spreadsheet; `sheets` maps sheet titles to their rows (default: one empty Sheet1)."""
+        spreadsheet = FakeSpreadsheet(spreadsheet_id, title)
+        for sheet_title, rows in (sheets or {"Sheet1": []}).items():
+            spreadsheet.add_sheet(sheet_title, rows)
+        self.spreadsheets[spreadsheet_id] = spreadsheet
+        return spreadsheet
+
+    def count(self, endpoint):
+        with self.lock:
+            self.counters[endpoint] = self.counters.get(endpoint, 0) + 1
+
+    def reset_counters(self):
+        with self.lock:
+            self.counters = {}
+            self.bytes_in = self.bytes_out = 0
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class FakeSheetsHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    fake = None
+
+    # (method, path pattern, endpoint name, quota kind)
+    ROUTES = [
+        ("GET", r"/v4/spreadsheets/([^/:]+)", "spreadsheets.get", "read"),
+        ("POST", r"/v4/spreadsheets/([^/:]+):batchUpdate", "spreadsheets.batchUpdate", "write"),
+        ("GET", r"/v4/spreadsheets/([^/:]+)/values:batchGet", "values.batchGet", "read"),
+        ("POST", r"/v4/spreadsheets/([^/:]+)/values:batchUpdate", "values.batchUpdate", "write"),
+        ("POST", r"/v4/spreadsheets/([^/:]+)/values/(.+):append", "values.append", "write"),
+        ("PUT", r"/v4/spreadsheets/([^/:]+)/values/(.+)", "values.update", "write"),
+        ("GET", r"/v4/spreadsheets/([^/:]+)/values/(.+)", "values.get", "read"),
+        ("GET", r"/drive/v3/files/([^/]+)/export", "drive.export", "read"),
+        ("GET", r"/drive/v3/files/([^/]+)", "drive.files.get", "read"),
+        ("GET", r"/spreadsheets/d/([^/]+)/export", "export", "read"),
+    ]
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.dispatch("GET")
+
+    def do_POST(self):
+        self.dispatch("POST")
+
+    def do_PUT(self):
+        self.dispatch("PUT")
+
+    def send_json(self, status, body, headers=None):
+        self.send_bytes(status, json.dumps(body).encode("utf-8"), "application/json; charset=UTF-8", headers)
+
+    def send_bytes(self, status, data, content_type, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+        with self.fake.lock:
+            self.fake.bytes_out += len(data)
+
+    def send_error_json(self, status, message, reason):
+        headers = {}
+        if status == 429 and self.fake.retry_after is not None:
+            headers["Retry-After"] = str(self.fake.retry_after)
+        self.send_json(status, {"error": {"code": status, "message": message, "status": reason}}, headers)
+
+    def dispatch(self, method):
+        fake = self.fake
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}") if length else {}
+        with fake.lock:
+            fake.bytes_in += length
+
+        for route_method, pattern, endpoint, kind in self.ROUTES:
+            match = re.fullmatch(pattern, url.path)
+            if route_method == method and match:
+                break
+        else:
+            self.send_error_json(404, f"No fake endpoint for {method} {url.path}", "NOT_FOUND")
+            return
+
+        delay = fake.latency + (fake.random.uniform(0, fake.jitter) if fake.jitter else 0)
+        if delay:
+            time.sleep(delay)
+
+        with fake.lock:
+            injected = fake.error_rate and fake.random.random() < fake.error_rate
+            throttled = not injected and not fake.quota[kind].allow(time.monotonic())
+        if injected and fake.error_status != 429:
+            fake.count("rejected")
+            self.send_error_json(fake.error_status, "Injected server error", "UNAVAILABLE")
+            return
+        if injected or throttled:
+            fake.count("rejected")
+            self.send_error_json(429, f"Quota exceeded for quota metric '{kind.title()} requests'",
+                                 "RESOURCE_EXHAUSTED")
+            return
+
+        fake.count(endpoint)
+        spreadsheet = fake.spreadsheets.get(unquote(match.group(1)))
+        if spreadsheet is None:
+            self.send_error_json(404, "Requested entity was not found.", "NOT_FOUND")
+            return
+        try:
+            with fake.lock:
+                handler = getattr(self, "handle_" + endpoint.replace(".", "_"))
+                result = handler(spreadsheet, query, body, *[unquote(g) for g in match.groups()[1:]])
+        except (KeyError, ValueError, AttributeError) as e:
+            self.send_error_json(400, str(e), "INVALID_ARGUMENT")
+            return
+        if isinstance(result, tuple):
+            self.send_bytes(200, *result)
+        else:
+            self.send_json(200, result)
+
+    # Sheets v4
+
+    def handle_spreadsheets_get(self, spreadsheet, query, body):
+        return spreadsheet.metadata()
+
+    def handle_spreadsheets_batchUpdate(self, spreadsheet, query, body):
+        replies = []
+        for request in body.get("requests", []):
+            if "updateCells" in request:
+                grid = request["updateCells"]["range"]
+                sheet = spreadsheet.sheet(gid=grid["sheetId"])
+                note = request["updateCells"]["rows"][0]["values"][0].get("note")
+                sheet.notes[(grid["startRowIndex"] + 1, grid["startColumnIndex"] + 1)] = note
+            elif "addSheet" in request:
+                title = request["addSheet"]["properties"]["title"]
+                sheet = spreadsheet.add_sheet(title)
+                replies.append({"addSheet": {"properties": sheet.properties(len(spreadsheet.sheets) - 1)}})
+                continue
+            # repeatCell and other formatting requests are accepted and ignored
+            replies.append({})
+        spreadsheet.touch()
+        return {"spreadsheetId": spreadsheet.id, "replies": replies}
+
+    def _value_range(self, spreadsheet, range_name, option):
+        title, bounds = parse_range(range_name)
+        sheet = spreadsheet.sheet(title)
+        first_row, first_col, last_row, last_col = bounds
+        values = sheet.read(bounds, option)
+        width = max((len(row) for row in values), default=0)
+        result = {
+            "range": a1_range(sheet.title, first_row, first_col,
+                              last_row or first_row + max(len(values), 1) - 1,
+                              last_col or first_col + max(width, 1) - 1),
+            "majorDimension": "ROWS",
+        }
+        if values:
+            result["values"] = values
+        return result
+
+    def handle_values_get(self, spreadsheet, query, body, range_name):
+        option = query.get("valueRenderOption", ["FORMATTED_VALUE"])[0]
+        return self._value_range(spreadsheet, range_name, option)
+
+    def handle_values_batchGet(self, spreadsheet, query, body):
+        option = query.get("valueRenderOption", ["FORMATTED_VALUE"])[0]
+        return {
+            "spreadsheetId": spreadsheet.id,
+            "valueRanges": [self._value_range(spreadsheet, r, option) for r in query.get("ranges", [])],
+        }
+
+    def handle_values_batchUpdate(self, spreadsheet, query, body):
+        responses = []
+        total = 0
+        for data in body.get("data", []):
+            title, (first_row, first_col, _, _) = parse_range(data["range"])
+            sheet = spreadsheet.sheet(title)
+            cells = sheet.write(first_row, first_col, data.get("values", []))
+            total += cells
+            responses.append({"spreadsheetId": spreadsheet.id, "updatedRange": data["range"], "updatedCells": cells})
+        spreadsheet.touch()
+        return {"spreadsheetId": spreadsheet.id, "totalUpdatedCells": total, "responses": responses}
+
+    def handle_values_update(self, spreadsheet, query, body, range_name):
+        title, (first_row, first_col, _, _) = parse_range(range_name)
+        sheet = spreadsheet.sheet(title)
+        values = body.get("values", [])
+        cells = sheet.write(first_row, first_col, values)
+        width = max((len(row) for row in values), default=1)
+        spreadsheet.touch()
+        return {
+            "spreadsheetId": spreadsheet.id,
+            "updatedRange": a1_range(sheet.title, first_row, first_col,
+                                     first_row + max(len(values), 1) - 1, first_col + width - 1),
+            "updatedRows": len(values),
+            "updatedColumns": width,
+            "updatedCells": cells,
+        }
+
+    def handle_values_append(self, spreadsheet, query, body, range_name):
+        title, (_, first_col, _, _) = parse_range(range_name)
+        sheet = spreadsheet.sheet(title)
+        values = body.get("values", [])
+        first_row = len(sheet.rows) + 1
+        cells = sheet.write(first_row, first_col, values)
+        width = max((len(row) for row in values), default=1)
+        spreadsheet.touch()
+        return {
+            "spreadsheetId": spreadsheet.id,
+            "tableRange": a1_range(sheet.title, 1, first_col, max(first_row - 1, 1), first_col + width - 1),
+            "updates": {
+                "spreadsheetId": spreadsheet.id,
+                "updatedRange": a1_range(sheet.title, first_row, first_col,
+                                         first_row + len(values) - 1, first_col + width - 1),
+                "updatedRows": len(values),
+                "updatedColumns": width,
+                "updatedCells": cells,
+            },
+        }
+
+    # Drive v3 and export
+
+    def handle_drive_files_get(self, spreadsheet, query, body):
+        return {
+            "id": spreadsheet.id,
+            "name": spreadsheet.title,
+            "mimeType": "application/vnd.google-apps.spreadsheet",
+            "modifiedTime": spreadsheet.modified.isoformat(timespec="milliseconds").replace("+00:00", "Z"),
+            "createdTime": spreadsheet.modified.isoformat(timespec="milliseconds").replace("+00:00", "Z"),
+            "version": str(spreadsheet.version),
+        }
+
+    def handle_drive_export(self, spreadsheet, query, body):
+        mime = query.get("mimeType", [XLSX_MIME])[0]
+        return spreadsheet.export("csv" if mime == "text/csv" else "xlsx")
+
+    def handle_export(self, spreadsheet, query, body):
+        gid = query.get("gid", [None])[0]
+        return spreadsheet.export(query.get("format", ["xlsx"])[0], int(gid) if gid is not None else None)
+
+
+class RedirectSession(requests.Session):
+    """requests session that sends Google API calls to `base_url` instead."""
+
+    def __init__(self, base_url):
+        super().__init__()
+        self.base_url = base_url.rstrip("/")
+
+    def request(self, method, url, *args, **kwargs):
+        for host in GOOGLE_HOSTS:
+            if url.startswith(host):
+                url = self.base_url + url[len(host):]
+                break
+        return super().request(method, url, *args, **kwargs)
+
+
+def local_client(base_url, rate_limits=None):
+    """
+    gspread client for a FakeSheetsServer (or any Sheets-compatible endpoint)
+    at `base_url`. No credentials are needed; requests still go through the
+    quota limiter.
+    """
+    import gspread
+
+    from src.rate_limit import rate_limited_http_client
+
+    return gspread.Client(None, session=RedirectSession(base_url),
+                          http_client=rate_limited_http_client(rate_limits, project=base_url))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Fake Google Sheets API server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency, in seconds")
+    parser.add_argument("--read-per-minute", type=int, default=None, help="read quota (default: unlimited)")
+    parser.add_argument("--write-per-minute", type=int, default=None, help="write quota (default: unlimited)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="probability of an injected error")
+    parser.add_argument("--error-status", type=int, default=429, help="HTTP status of injected errors")
+    parser.add_argument("--retry-after", type=float, default=None, help="Retry-After seconds on 429s")
+    parser.add_argument("--spreadsheet-id", default="fake", help="ID of the spreadsheet to create")
+    parser.add_argument("--sheets", default="Sheet1", help="comma-separated worksheet titles")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    server = FakeSheetsServer(
+        latency=args.latency, jitter=args.jitter,
+        read_per_minute=args.read_per_minute, write_per_minute=args.write_per_minute,
+        error_rate=args.error_rate, error_status=args.error_status, retry_after=args.retry_after, port=args.port,
+    )
+    server.add_spreadsheet(args.spreadsheet_id, sheets={title.strip(): [] for title in args.sheets.split(",")})
+    print(f"🧪 Fake Sheets API on {server.url} — spreadsheet '{args.spreadsheet_id}'. Ctrl+C to stop.")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print("\n" + json.dumps(server.counters, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+from datetime import datetime
+
+import pandas as pd
+
+from src.format_plan import CANONICAL_DATE, DATE_FORMAT, compile_formats
+
+
+def _as_text(col):
+    """str(value) for every cell; missing values become "nan" like str() does."""
+    return col.map(str).astype(object)
+
+
+def _fill_falsy(col, default_val):
+    """`value or default` for a whole column."""
+    col = col.astype(object)
+    return col.where(col.astype(bool), default_val)
+
+
+def _number_column(col, default_val):
+    converted = pd.to_numeric(col, errors="coerce").astype(float)
+    if pd.api.types.is_numeric_dtype(col.dtype):
+        return converted.astype(object)
+    # float(nan) stays nan; anything else that does not parse (None included) gets the default
+    failed = converted.isna() & ~col.map(lambda v: isinstance(v, float))
+    return converted.astype(object).where(~failed, default_val)
+
+
+def _link_column(col, default_val, formula_sep):
+    links = '=HYPERLINK("' + _as_text(col) + f'"{formula_sep} "{default_val}")'
+    return links.astype(object).where(col.astype(object).astype(bool), default_val)
+
+
+def _formula_column(col, default_val):
+    formulas = _fill_falsy(col, default_val)
+    as_text = _as_text(formulas)
+    return formulas.where(as_text.str.startswith("="), "=" + as_text)
+
+
+def _date_column(col, default_val):
+    as_text = _as_text(col)
+    parsed = pd.to_datetime(as_text, format=DATE_FORMAT, errors="coerce")
+    dates = as_text.where(parsed.notna(), default_val)
+
+    # Only dates not already written as MM/DD/YYYY HH:MM:SS need re-rendering
+    rewrite = parsed.notna() & ~as_text.str.fullmatch(CANONICAL_DATE.pattern)
+    if rewrite.any():
+        dates[rewrite] = parsed[rewrite].dt.strftime(DATE_FORMAT).astype(object)
+
+    is_now = as_text.str.lower() == "now"
+    if is_now.any():
+        dates = dates.where(~is_now, datetime.now().strftime(DATE_FORMAT))
+    return dates
+
+
+def format_frame(df, cell_formats, locale="US"):
+    """
+    Format a whole DataFrame column by column with pandas, instead of calling
+    format_row cell by cell. Column i of `df` is formatted with cell_formats[i].
+
+    Returns:
+        formatted_rows: list of row value lists ready for gspread
+        notes: list of (column_index, note) lists, one per row
+        formats: formatting metadata for each column (type, pattern)
+    """
+    cell_formats = cell_formats or []
+    formula_sep = "," if locale.upper() == "US" else ";"
+    formats = compile_formats(cell_formats, locale).formats
+
+    columns = []
+    tag_columns = []
+    for i, fmt in enumerate(cell_formats):
+        fmt_type = fmt.get("type", "text").lower()
+        default_val = fmt.get("default", "")
+        if i < df.shape[1]:
+            col = df.iloc[:, i]
+        else:
+            col = pd.Series([""] * len(df), index=df.index, dtype=object)
+
+        if fmt_type in ("number", "percent", "currency"):
+            columns.append(_number_column(col, default_val))
+        elif fmt_type == "link":
+            columns.append(_link_column(col, default_val, formula_sep))
+        elif fmt_type == "formula":
+            columns.append(_formula_column(col, default_val))
+        elif fmt_type == "tags":
+            columns.append(pd.Series([default_val] * len(df), index=df.index, dtype=object))
+            tag_columns.append((i, col))
+        elif fmt_type == "date":
+            columns.append(_date_column(col, default_val))
+        else:
+            columns.append(_fill_falsy(col, default_val))
+
+    formatted_rows = [list(row) for row in zip(*(col.tolist() for col in columns))]
+    if not columns:
+        formatted_rows = [[] for _ in range(len(df))]
+
+    notes = [[] for _ in range(len(df))]
+    for i, col in tag_columns:
+        for row_notes, value in zip(notes, col.tolist()):
+            row_notes.append((i, value))
+
+    return formatted_rows, notes, formats
@@ -1,6 +1,6 @@
 from datetime import datetime
+import json
 import gspread
-import pandas as pd
 def get_start_col(start_cell="A"):
     """
     Convert start_cell like "B2" or "C" to a 1-indexed column number.
@@ -16,19 +16,89 @@ def get_start_col(start_cell="A"):
     col_number = gspread.utils.a1_to_rowcol(f"{col_letters}1")[1]
     return col_number
 
-def read_csv_with_locale(csv_path, locale="US"):
+def writes_in_flight(action, config):
     """
-    Reads CSV with appropriate delimiter based on locale.
+    Number of chunk writes an action may keep in flight at once: `in_flight`
+    on the action, else `concurrency.in_flight` in config.json, else 1
+    (one request at a time, through gspread).
     """
-    delimiter = "," if locale.upper() == "US" else ";"
-    try:
-        df = pd.read_csv(csv_path, delimiter=";")
-        return df
-    except Exception as e:
-        print(f"❌ Failed to read CSV '{csv_path}' with delimiter '{delimiter}': {e}")
-        return None
+    value = max(1, int(action.get("in_flight") or config.get("concurrency", {}).get("in_flight") or 1))
+    if value > 1:
+        try:
+            import httpx  # noqa: F401
+        except ImportError:
+            print("⚠️ Concurrent writes need httpx (pip install httpx); sending one request at a time.")
+            return 1
+    return value
+
+def split_rows_by_payload(rows, max_bytes):
+    """
+    Split rows into consecutive chunks whose JSON size stays under `max_bytes`.
+    A single row larger than the limit still gets a chunk of its own.
+
+    Yields:
+        (offset, chunk) tuples, where offset is the index of the chunk's first row
+    """
+    start = 0
+    size = 0
+    for i, row in enumerate(rows):
+        row_size = len(json.dumps(row, default=str)) + 1
+        if i > start and size + row_size > max_bytes:
+            yield start, rows[start:i]
+            start = i
+            size = 0
+        size += row_size
+    if start < len(rows):
+        yield start, rows[start:]
+
+
+def normalize_cell(value):
+    """
+    Render a cell the same way whether it comes from the formatter or from
+    the sheet (FORMULA render), so 5.0 and 5 compare equal.
+    """
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def parse_updated_range(updated_range):
+    """
+    Convert an A1 range returned by the API, e.g. "'Main'!A5:G9" or "Main!A5",
+    into a (first_row, last_row) tuple.
+    """
+    cells = updated_range.rsplit("!", 1)[-1].split(":")
+    first_row = gspread.utils.a1_to_rowcol(cells[0])[0]
+    last_row = gspread.utils.a1_to_rowcol(cells[-1])[0]
+    return first_row, last_row
+
+
+class AppendedRangeTracker:
+    """
+    Tracks which rows were written by values.append calls, using the
+    `updates.updatedRange` of each response instead of re-reading the sheet.
+    """
+
+    def __init__(self):
+        self.first_row = None
+        self.last_row = None
+
+    def record(self, response):
+        """
+        Record one append response.
+
+        Returns:
+            (first_row, last_row) written by that response
+        """
+        first_row, last_row = parse_updated_range(response["updates"]["updatedRange"])
+        if self.first_row is None or first_row < self.first_row:
+            self.first_row = first_row
+        if self.last_row is None or last_row > self.last_row:
+            self.last_row = last_row
+        return first_row, last_row
 
-from datetime import datetime
 
 def format_row(row_values, cell_formats, locale="US"):
     """
@@ -83,19 +153,14 @@ def format_row(row_values, cell_formats, locale="US"):
             formatted_values.append(formula_val)
 
             # If note contains recognized keywords (like percent or currency),
-            # return them as format hints.
+            # use them as format hints.
             if note := fmt.get("note", "").lower():
                 if "percent" in note:
-                    formats.append({"type": "NUMBER", "pattern": "0.00%"})
+                    cell_format["pattern"] = "0.00%"
                 elif "currency" in note:
-                    formats.append({"type": "NUMBER", "pattern": "$#,##0.00"})
+                    cell_format["pattern"] = "$#,##0.00"
                 elif "number" in note:
-                    formats.append({"type": "NUMBER", "pattern": "0.00"})
-                else:
-                    formats.append({})
-            else:
-                formats.append({})
-
+                    cell_format["pattern"] = "0.00"
 
         elif fmt_type == "currency":
             try:
@@ -0,0 +1,225 @@
+import json
+import os
+import re
+import time
+
+import gspread
+
+from src.dedupe import DEFAULT_CACHE_DIR, row_hash
+from src.helper import parse_updated_range
+
+# Rows per read when looking for the end of the data from the bottom of the grid
+TAIL_ROWS = 1000
+
+
+def journal_path(config, spreadsheet_id, action):
+    name = re.sub(r"[^\w.-]", "_", action.get("name") or "action")
+    cache_dir = config.get("cache_dir", DEFAULT_CACHE_DIR)
+    return os.path.join(cache_dir, "journal", f"{spreadsheet_id}_{name}.jsonl")
+
+
+def skip_rows(chunks, count):
+    """Drop the first `count` rows from a stream of (formatted_rows, row_notes, formats) chunks."""
+    for formatted_rows, row_notes, formats in chunks:
+        if count >= len(formatted_rows):
+            count -= len(formatted_rows)
+            continue
+        yield formatted_rows[count:], row_notes[count:], formats
+        count = 0
+
+
+def source_stamp(csv_path):
+    """Size and modification time of the CSV, to refuse resuming from a changed file."""
+    stat = os.stat(csv_path)
+    return {"csv": csv_path, "size": stat.st_size, "mtime": stat.st_mtime}
+
+
+def grid_row_count(worksheet):
+    """Current row count of the worksheet's grid (one spreadsheets.get call)."""
+    metadata = worksheet.spreadsheet.fetch_sheet_metadata(
+        params={"fields": "sheets.properties(sheetId,gridProperties.rowCount)"}
+    )
+    for sheet in metadata.get("sheets", []):
+        if sheet["properties"]["sheetId"] == worksheet.id:
+            return sheet["properties"]["gridProperties"]["rowCount"]
+    return worksheet.row_count
+
+
+def last_data_row(worksheet, col_number, width, window):
+    """
+    Last row with data in the `width` columns from col_number, found by
+    reading back from the end of the grid `window` rows at a time. An
+    append that grew the grid ends in the first window read.
+    """
+    first_column = gspread.utils.rowcol_to_a1(1, col_number)[:-1]
+    last_column = gspread.utils.rowcol_to_a1(1, col_number + width - 1)[:-1]
+    end = grid_row_count(worksheet)
+    while end > 0:
+        start = max(1, end - window + 1)
+        # The API drops trailing empty rows, so the length gives the last row with data
+        response = worksheet.spreadsheet.values_get(
+            gspread.utils.absolute_range_name(worksheet.title, f"{first_column}{start}:{last_column}{end}")
+        )
+        rows = response.get("values", [])
+        if rows:
+            return start + len(rows) - 1
+        end = start - 1
+    return 0
+
+
+class Journal:
+    """
+    Write-ahead journal of one append run, one JSON record per line.
+
+    Before a batch is sent a `pending` record stores its source row offset,
+    row count and the hash of its last row; after the API answers, a
+    `commit` record stores the range it returned. A run that stops midway
+    leaves at most one batch pending, which `recover` settles with a
+    one-row read once the row it would have ended at is known.
+
+    Runs that keep several chunk writes in flight (see append_stream_async)
+    are started with `ranges`: their chunks go to explicit rows below the
+    last commit, so several can be pending and a resume simply rewrites
+    everything after the last commit in place.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+        self.grid_rows = None
+
+    def _write(self, record):
+        record["time"] = time.time()
+        self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def read(self):
+        """
+        Replay the journal.
+
+        Returns:
+            dict with the start record (`source`), `committed` rows, the
+            sheet row of the last commit (`last_row`), the `pending` record
+            (or None), whether chunks were written to explicit `ranges`, the
+            worksheet's row count before the run grew it (`grid_rows`), and
+            `done`; None if there is no journal
+        """
+        try:
+            with open(self.path, "r") as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return None
+
+        state = {"source": None, "committed": 0, "last_row": None, "pending": None, "ranges": False,
+                 "grid_rows": None, "done": False}
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A torn last line means the process died while writing it
+                break
+            event = record["event"]
+            if event == "start":
+                state["source"] = record["source"]
+                state["ranges"] = record.get("ranges", False)
+            elif event == "resume":
+                state["ranges"] = state["ranges"] or record.get("ranges", False)
+            elif event == "pending":
+                state["pending"] = record
+            elif event == "commit":
+                state["committed"] = record["offset"] + record["rows"]
+                state["last_row"] = parse_updated_range(record["range"])[1] if record.get("range") else state["last_row"]
+                state["pending"] = None
+            elif event == "grid" and state["grid_rows"] is None:
+                state["grid_rows"] = record["rows"]
+            elif event == "done":
+                state["done"] = True
+        return state
+
+    def start(self, source, resume=False, ranges=False, grid_rows=None):
+        """
+        Open the journal: a new run truncates it, a resumed run appends to it
+        and passes the `grid_rows` of the state it resumes.
+        """
+        self.grid_rows = grid_rows
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.file = open(self.path, "a" if resume else "w")
+        self._write({"event": "resume" if resume else "start", "source": source, "ranges": ranges})
+
+    def pending(self, offset, rows):
+        self._write({
+            "event": "pending",
+            "offset": offset,
+            "rows": len(rows),
+            "width": len(rows[-1]),
+            "last_hash": row_hash(rows[-1]),
+        })
+
+    def grid(self, row_count):
+        """
+        Record the worksheet's row count before a ranges run first grows the
+        grid. Returns the count recorded first, which for a resumed run is
+        the one the interrupted run started with.
+        """
+        if self.grid_rows is None:
+            self.grid_rows = row_count
+            self._write({"event": "grid", "rows": row_count})
+        return self.grid_rows
+
+    def commit(self, offset, row_count, updated_range=None):
+        self._write({"event": "commit", "offset": offset, "rows": row_count, "range": updated_range})
+
+    def finish(self, success=True):
+        if self.file:
+            if success:
+                self._write({"event": "done"})
+            self.file.close()
+            self.file = None
+
+    def recover(self, worksheet, col_number, state):
+        """
+        Decide whether the pending batch of a failed run reached the sheet,
+        by reading the one row where its last row would have landed. After
+        a commit that row follows from the committed range; before the first
+        commit it is the end of the data, looked up from the bottom of the
+        grid (see last_data_row).
+
+        Returns:
+            number of source rows already in the sheet, to skip on resume
+        """
+        pending = state["pending"]
+        if not pending:
+            return state["committed"]
+        if state["ranges"] and state["last_row"] is not None:
+            # Chunks after the last commit are rewritten at the same rows, whether they landed or not
+            return state["committed"]
+
+        if state["last_row"] is not None:
+            expected_row = state["last_row"] + pending["rows"]
+        else:
+            # No batch was committed yet: the pending one would be the last rows of the sheet
+            expected_row = last_data_row(worksheet, col_number, pending["width"], max(pending["rows"], TAIL_ROWS))
+
+        landed = False
+        if expected_row > 0:
+            width = pending["width"]
+            cells = worksheet.get_values(
+                f"{gspread.utils.rowcol_to_a1(expected_row, col_number)}:"
+                f"{gspread.utils.rowcol_to_a1(expected_row, col_number + width - 1)}",
+                value_render_option="FORMULA",
+                date_time_render_option="FORMATTED_STRING",
+            )
+            if cells:
+                # The API drops trailing empty cells
+                row = list(cells[0]) + [""] * (width - len(cells[0]))
+                landed = row_hash(row) == pending["last_hash"]
+
+        if landed:
+            print(f"🔎 Last batch before the failure reached the sheet (row {expected_row}).")
+            first_row = expected_row - pending["rows"] + 1
+            self.commit(pending["offset"], pending["rows"], f"{gspread.utils.rowcol_to_a1(first_row, col_number)}:"
+                        f"{gspread.utils.rowcol_to_a1(expected_row, col_number)}")
+            return pending["offset"] + pending["rows"]
+        print("🔎 Last batch before the failure did not reach the sheet; sending it again.")
+        return pending["offset"]
@@ -20,11 +20,15 @@ def prompt_input(prompt_text, default="", note=""):
     user_input = input(f"{prompt_text} [{default}]: ").strip()
     return user_input if user_input else default
 
-def input_sheet_name_with_gid(service, spreadsheet_id):
+def input_sheet_name_with_gid(service, spreadsheet_id, cache=None):
     """
     Prompt user for a sheet name and get its GID (worksheet ID).
     Retries if not found, or user can leave blank to skip.
+    Lookups go through `cache` (a SheetCache) when one is given.
     """
+    if cache is None:
+        from src.sheet_cache import SheetCache
+        cache = SheetCache(service)
     while True:
         sheet_name = prompt_input("Sheet name (leave blank for default)")
         if not sheet_name:
@@ -32,9 +36,8 @@ def input_sheet_name_with_gid(service, spreadsheet_id):
             return "", ""
 
         try:
-            # Open spreadsheet and get worksheet
-            spreadsheet = service.open_by_key(spreadsheet_id)
-            worksheet = spreadsheet.worksheet(sheet_name)
+            # Get worksheet from the shared metadata cache
+            worksheet = cache.worksheet(spreadsheet_id, sheet_name)
             gid = worksheet.id
             print(f"Found sheet '{sheet_name}' with GID {gid}")
             return sheet_name, gid
@@ -93,7 +96,7 @@ def collect_cell_formats(action, column_total=None):
 
 def handle_append_details(action):
     """Handle extra prompts and structure for append actions."""
-    append_mode = prompt_input("Append type (single/multiple)", "single")
+    append_mode = prompt_input("Append type (single/multiple/bulk)", "single")
     action["append_mode"] = append_mode
 
     if append_mode == "single":
@@ -105,6 +108,13 @@ def handle_append_details(action):
     else:
         # Multiple rows: CSV/manual/sheet
         action = collect_source_values(action, allow_sheet=True)
+        if append_mode == "bulk":
+            action["chunk_size"] = max(1, int(prompt_input("Rows per append request", "1000")))
+        if action.get("source_type") == "csv":
+            action["incremental"] = prompt_input("Skip rows already in the sheet? (y/n)", "n").lower()
+            if action["incremental"] == "y":
+                keys = prompt_input("Key columns from the CSV header, comma-separated (blank for whole row)", "")
+                action["dedupe_keys"] = [k.strip() for k in keys.split(",") if k.strip()]
         action["start_cell"] = prompt_input("Start cell (e.g., A1, if append just the letter)", "A1")
         action["open_sheet"] = prompt_input("Open sheet before appending? (y/n)", "n").lower() == "y"
         action = collect_cell_formats(action)
@@ -115,19 +125,42 @@ def handle_update_details(action):
     """Handle extra prompts and structure for update actions."""
     action = collect_source_values(action, allow_sheet=False)
     action["target_cell"] = prompt_input("Target cell to update (e.g., B2 or B2:D2)", "A1")
+    action["diff"] = prompt_input("Write only cells that changed? (y/n)", "n").lower()
     action["open_sheet"] = prompt_input("Open sheet after update? (y/n)", "n").lower() == "y"
     action = collect_cell_formats(action)
     return action
 
-def create_action(service=None, spreadsheet_id=None):
+def handle_snapshot_details(action):
+    """Handle extra prompts and structure for snapshot actions."""
+    sheets = prompt_input("Worksheets to dump, comma-separated (blank for the sheet above, or all)", "")
+    action["snapshot_sheets"] = [s.strip() for s in sheets.split(",") if s.strip()]
+    action["snapshot_format"] = prompt_input("Snapshot format (parquet/arrow)", "parquet").lower()
+    action = collect_cell_formats(action)
+    return action
+
+def handle_backup_details(action):
+    """Handle extra prompts and structure for backup actions."""
+    sheets = prompt_input("Worksheets to back up, comma-separated (blank for the sheet above, or all)", "")
+    action["backup_sheets"] = [s.strip() for s in sheets.split(",") if s.strip()]
+    retention = {}
+    for key, label in (("keep_last", "Always keep the newest N versions"),
+                       ("keep_hourly", "Keep one version per hour for the last N hours"),
+                       ("keep_daily", "Keep one version per day for the last N days")):
+        value = prompt_input(f"{label} (blank for no limit)", "")
+        if value:
+            retention[key] = int(value)
+    action["retention"] = retention
+    return action
+
+def create_action(service=None, spreadsheet_id=None, cache=None):
     """Collect general action configuration, then delegate to type-specific details."""
     action = {}
     action["name"] = prompt_input("Action name")
-    action["action"] = prompt_input("Action type (append/update/custom_script/delete)")
+    action["action"] = prompt_input("Action type (append/update/snapshot/backup/custom_script/delete)")
 
     # --- Sheet selection ---
     if service and spreadsheet_id:
-        sheet_name, gid = input_sheet_name_with_gid(service, spreadsheet_id)
+        sheet_name, gid = input_sheet_name_with_gid(service, spreadsheet_id, cache)
         action["sheet_name"] = sheet_name
         action["sheet_id"] = gid
     else:
@@ -139,6 +172,10 @@ def create_action(service=None, spreadsheet_id=None):
         action = handle_append_details(action)
     elif action["action"] == "update":
         action = handle_update_details(action)
+    elif action["action"] == "snapshot":
+        action = handle_snapshot_details(action)
+    elif action["action"] == "backup":
+        action = handle_backup_details(action)
     elif action["action"] == "custom_script":
         action["custom_script"] = prompt_input("Custom script file name")
 
@@ -164,7 +201,7 @@ def delete_action(actions):
         print("Invalid selection.")
     return actions
 
-def main(config, service):
+def main(config, service, cache=None):
     actions = load_actions()
 
     while True:
@@ -183,7 +220,7 @@ def main(config, service):
                 for idx, act in enumerate(actions):
                     print(f"{idx}: {act['name']} ({act['action']})")
         elif choice == "2":
-            new_action = create_action(service, config.get("spreadsheet_id"))
+            new_action = create_action(service, config.get("spreadsheet_id"), cache)
             actions.append(new_action)
             save_actions(actions)
             print("Action added successfully.")
@@ -0,0 +1,212 @@
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+DEFAULT_METRICS_DIR = "metrics"
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+# API stages that leave the spreadsheet unchanged
+READ_ENDPOINTS = ("values.get", "values.batchGet", "spreadsheets.get", "drive.files.get", "drive.export", "export")
+
+# api.* stages recorded by the rate limiter rather than for a request
+LIMITER_STAGES = ("quota_wait", "retry")
+
+# Metrics of the action running in the current thread (see collecting())
+_current = contextvars.ContextVar("metrics", default=None)
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(-(-q * len(sorted_values) // 1)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class Metrics:
+    """
+    Call counts, bytes and latencies per stage of one action run.
+
+    Stages are the steps of an action (parse, format, write, note,
+    format-apply) and every Sheets API request, as api.<endpoint>.
+    """
+
+    def __init__(self, action_name):
+        self.action_name = action_name
+        self.started = time.time()
+        self.seconds = 0.0
+        self.success = None
+        self.stages = {}
+        self.lock = threading.Lock()
+
+    def observe(self, stage, seconds, bytes_sent=0, bytes_received=0, error=False):
+        with self.lock:
+            entry = self.stages.setdefault(stage, {"durations": [], "bytes_sent": 0, "bytes_received": 0, "errors": 0})
+            entry["durations"].append(seconds)
+            entry["bytes_sent"] += bytes_sent
+            entry["bytes_received"] += bytes_received
+            entry["errors"] += int(error)
+
+    def write_calls(self):
+        """Successful API requests of this run that changed a spreadsheet."""
+        with self.lock:
+            return sum(
+                len(entry["durations"]) - entry["errors"]
+                for stage, entry in self.stages.items()
+                if stage.startswith("api.") and stage[4:] not in READ_ENDPOINTS + LIMITER_STAGES
+            )
+
+    def summary(self):
+        """Per-stage count, bytes, total seconds and p50/p95/p99/max latencies."""
+        with self.lock:
+            stages = {}
+            for stage, entry in self.stages.items():
+                durations = sorted(entry["durations"])
+                stages[stage] = {
+                    "count": len(durations),
+                    "errors": entry["errors"],
+                    "bytes_sent": entry["bytes_sent"],
+                    "bytes_received": entry["bytes_received"],
+                    "seconds": sum(durations),
+                    **{f"p{int(q * 100)}": percentile(durations, q) for q in QUANTILES},
+                    "max": durations[-1] if durations else 0.0,
+                }
+        return {
+            "action": self.action_name,
+            "started": self.started,
+            "seconds": self.seconds,
+            "success": self.success,
+            "stages": stages,
+        }
+
+    def prometheus(self):
+        """The summary in the Prometheus text exposition format."""
+        summary = self.summary()
+        action = _label(self.action_name)
+        lines = [
+            "# HELP gsheet_stage_seconds Latency of each stage and API call of an action run.",
+            "# TYPE gsheet_stage_seconds summary",
+        ]
+        for stage, s in summary["stages"].items():
+            labels = f'action="{action}",stage="{_label(stage)}"'
+            for q in QUANTILES:
+                lines.append(f'gsheet_stage_seconds{{{labels},quantile="{q}"}} {s[f"p{int(q * 100)}"]:.6f}')
+            lines.append(f"gsheet_stage_seconds_sum{{{labels}}} {s['seconds']:.6f}")
+            lines.append(f"gsheet_stage_seconds_count{{{labels}}} {s['count']}")
+
+        for name, key, help_text in (
+            ("gsheet_stage_errors", "errors", "Failed calls per stage."),
+            ("gsheet_stage_bytes_sent", "bytes_sent", "Request bytes sent per stage."),
+            ("gsheet_stage_bytes_received", "bytes_received", "Response bytes received per stage."),
+        ):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+            for stage, s in summary["stages"].items():
+                lines.append(f'{name}{{action="{action}",stage="{_label(stage)}"}} {s[key]}')
+
+        lines += [
+            "# HELP gsheet_action_seconds Wall time of the last run.",
+            "# TYPE gsheet_action_seconds gauge",
+            f'gsheet_action_seconds{{action="{action}"}} {summary["seconds"]:.6f}',
+            "# HELP gsheet_action_success 1 if the last run succeeded.",
+            "# TYPE gsheet_action_success gauge",
+            f'gsheet_action_success{{action="{action}"}} {int(bool(summary["success"]))}',
+            "# HELP gsheet_action_last_run_timestamp_seconds Start time of the last run.",
+            "# TYPE gsheet_action_last_run_timestamp_seconds gauge",
+            f'gsheet_action_last_run_timestamp_seconds{{action="{action}"}} {summary["started"]:.3f}',
+        ]
+        return "\n".join(lines) + "\n"
+
+    def write(self, metrics_dir=DEFAULT_METRICS_DIR):
+        """
+        Write <action>.json and <action>.prom to `metrics_dir`. Files are
+        replaced atomically, as the node_exporter textfile collector expects.
+
+        Returns:
+            path of the JSON file
+        """
+        os.makedirs(metrics_dir, exist_ok=True)
+        name = "".join(c if c.isalnum() or c in "-_." else "_" for c in self.action_name or "action")
+        json_path = os.path.join(metrics_dir, f"{name}.json")
+        for path, text in (
+            (json_path, json.dumps(self.summary(), indent=2)),
+            (os.path.join(metrics_dir, f"{name}.prom"), self.prometheus()),
+        ):
+            with open(path + ".tmp", "w") as f:
+                f.write(text)
+            os.replace(path + ".tmp", path)
+        return json_path
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def current():
+    """Metrics of the action running in this thread, or None."""
+    return _current.get()
+
+
+@contextlib.contextmanager
+def collecting(metrics):
+    """Attribute stages and API calls made inside the block to `metrics`."""
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+
+
+@contextlib.contextmanager
+def stage(name):
+    """Time the block as one call of stage `name`; a no-op outside collecting()."""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    error = True
+    try:
+        yield
+        error = False
+    finally:
+        metrics.observe(name, time.perf_counter() - start, error=error)
+
+
+def timed_call(name, func, *args, **kwargs):
+    """func(*args, **kwargs), timed as one call of stage `name`."""
+    with stage(name):
+        return func(*args, **kwargs)
+
+
+def timed_iter(name, iterable):
+    """Yield from `iterable`, timing each item as one call of stage `name`."""
+    iterator = iter(iterable)
+    while True:
+        with stage(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+def endpoint_name(method, url):
+    """Short name of a Sheets / Drive API request, e.g. values.append."""
+    path = urlsplit(url).path
+    if "/drive/" in path:
+        return "drive.export" if path.endswith("/export") else f"drive.files.{method.lower()}"
+    if "/values" in path:
+        for suffix in (":batchUpdate", ":batchGet", ":batchClear", ":append", ":clear"):
+            if path.endswith(suffix):
+                return "values." + suffix[1:]
+        return "values.update" if method.lower() == "put" else "values.get"
+    if path.endswith(":batchUpdate"):
+        return "spreadsheets.batchUpdate"
+    if path.endswith("/export"):
+        return "export"
+    return "spreadsheets.get" if method.lower() == "get" else f"spreadsheets.{method.lower()}"
@@ -0,0 +1,295 @@
+import os
+import sqlite3
+import threading
+import time
+
+import gspread
+
+from src import metrics
+
+DEFAULT_WINDOW_ROWS = 5000
+DEFAULT_WINDOWS_PER_REQUEST = 5
+
+# Widest range the API accepts, for reads that must not miss columns
+LAST_COLUMN = "ZZZ"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS worksheets (
+    spreadsheet_id TEXT NOT NULL,
+    worksheet_id INTEGER NOT NULL,
+    title TEXT,
+    modified_time TEXT,
+    version TEXT,
+    synced_at REAL,
+    PRIMARY KEY (spreadsheet_id, worksheet_id)
+);
+CREATE TABLE IF NOT EXISTS cells (
+    spreadsheet_id TEXT NOT NULL,
+    worksheet_id INTEGER NOT NULL,
+    row INTEGER NOT NULL,
+    col INTEGER NOT NULL,
+    value,
+    PRIMARY KEY (spreadsheet_id, worksheet_id, row, col)
+) WITHOUT ROWID;
+"""
+
+# One mirror per database file, shared by every action of the process
+_mirrors = {}
+_mirrors_lock = threading.Lock()
+
+
+def get_mirror(config):
+    """
+    The shared SheetMirror when `mirror` is "y" in config.json, else None.
+    The database is <cache_dir>/mirror.sqlite unless `mirror_path` is set.
+    """
+    if config.get("mirror", "n") != "y":
+        return None
+    path = config.get("mirror_path") or os.path.join(config.get("cache_dir", "cache"), "mirror.sqlite")
+    with _mirrors_lock:
+        if path not in _mirrors:
+            _mirrors[path] = SheetMirror(
+                path,
+                window_rows=config.get("mirror_window_rows", DEFAULT_WINDOW_ROWS),
+            )
+        return _mirrors[path]
+
+
+def _trim(row):
+    """Drop trailing empty cells, as the API does."""
+    end = len(row)
+    while end and row[end - 1] in ("", None):
+        end -= 1
+    return row[:end]
+
+
+def drive_revision(worksheet):
+    """Drive `modifiedTime` and `version` of the worksheet's spreadsheet (one files.get call)."""
+    response = worksheet.client.request(
+        "get",
+        f"{gspread.urls.DRIVE_FILES_API_V3_URL}/{worksheet.spreadsheet_id}",
+        params={"fields": "modifiedTime,version", "supportsAllDrives": True},
+    )
+    metadata = response.json()
+    return metadata.get("modifiedTime"), metadata.get("version")
+
+
+class SheetMirror:
+    """
+    Local SQLite copy of worksheet cells (FORMULA render, dates as shown),
+    so hot paths such as diff updates and dedupe read from disk instead of
+    the API.
+
+    refresh() first asks Drive for the spreadsheet revision and reads
+    nothing if it did not change. Otherwise the whole worksheet is re-read
+    in windows of `window_rows` rows, several windows per values.batchGet;
+    only the local rewrite is limited to the rows that differ. Drive keeps
+    one revision per spreadsheet, so an edit to any tab re-reads every
+    mirrored tab of it in full on its next refresh. Writes made by our own
+    actions go through begin(), write() and settle(), so they do not force a
+    re-read.
+    """
+
+    def __init__(self, path, window_rows=DEFAULT_WINDOW_ROWS, windows_per_request=DEFAULT_WINDOWS_PER_REQUEST,
+                 clock=time.time):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.window_rows = window_rows
+        self.windows_per_request = windows_per_request
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+        self.rows_read = 0
+        # Worksheets with our own writes under way: was the mirror in sync when they began?
+        self.writing = {}
+
+    @staticmethod
+    def _key(worksheet):
+        return worksheet.spreadsheet_id, worksheet.id
+
+    def _state(self, worksheet):
+        return self.db.execute(
+            "SELECT modified_time, version, synced_at FROM worksheets WHERE spreadsheet_id = ? AND worksheet_id = ?",
+            self._key(worksheet),
+        ).fetchone()
+
+    def _save_state(self, worksheet, modified_time, version):
+        self.db.execute(
+            "INSERT OR REPLACE INTO worksheets VALUES (?, ?, ?, ?, ?, ?)",
+            (*self._key(worksheet), worksheet.title, modified_time, version, self.clock()),
+        )
+
+    def _local_rows(self, worksheet, first_row, last_row=None, first_col=1, last_col=None):
+        """Mirrored cells as {row: [values]}, columns from first_col."""
+        query = ("SELECT row, col, value FROM cells WHERE spreadsheet_id = ? AND worksheet_id = ? "
+                 "AND row >= ? AND row <= ? AND col >= ? AND col <= ? ORDER BY row, col")
+        rows = {}
+        for row, col, value in self.db.execute(
+            query, (*self._key(worksheet), first_row, last_row or 2 ** 62, first_col, last_col or 2 ** 62)
+        ):
+            cells = rows.setdefault(row, [])
+            cells.extend([""] * (col - first_col - len(cells)))
+            cells.append(value)
+        return rows
+
+    def _replace_row(self, worksheet, row, first_col, values, last_col=None):
+        """Set row `row` from first_col to last_col (the end of the row if None) to `values`."""
+        key = self._key(worksheet)
+        self.db.execute(
+            "DELETE FROM cells WHERE spreadsheet_id = ? AND worksheet_id = ? AND row = ? AND col >= ? AND col <= ?",
+            (*key, row, first_col, last_col or 2 ** 62),
+        )
+        self.db.executemany(
+            "INSERT INTO cells VALUES (?, ?, ?, ?, ?)",
+            [(*key, row, first_col + i, value) for i, value in enumerate(values) if value not in ("", None)],
+        )
+
+    def _last_row(self, worksheet):
+        row = self.db.execute(
+            "SELECT MAX(row) FROM cells WHERE spreadsheet_id = ? AND worksheet_id = ?", self._key(worksheet)
+        ).fetchone()[0]
+        return row or 0
+
+    def _read_windows(self, worksheet):
+        """
+        Re-read the whole worksheet window by window and rewrite the rows that
+        differ. The last window is open-ended, so rows added since the
+        worksheet metadata was loaded are not missed.
+        """
+        title = worksheet.title
+        quoted = "'" + title.replace("'", "''") + "'"
+        total_rows = max(worksheet.row_count, self._last_row(worksheet), 1)
+        starts = list(range(1, total_rows + 1, self.window_rows))
+        ranges = [f"{quoted}!A{start}:{LAST_COLUMN}{start + self.window_rows - 1}" for start in starts[:-1]]
+        ranges.append(f"{quoted}!A{starts[-1]}:{LAST_COLUMN}")
+
+        changed = 0
+        key = self._key(worksheet)
+        for i in range(0, len(ranges), self.windows_per_request):
+            batch = ranges[i:i + self.windows_per_request]
+            response = worksheet.spreadsheet.values_batch_get(
+                batch,
+                params={"valueRenderOption": "FORMULA", "dateTimeRenderOption": "FORMATTED_STRING"},
+            )
+            for start, value_range in zip(starts[i:i + len(batch)], response.get("valueRanges", [])):
+                values = value_range.get("values", [])
+                self.rows_read += len(values)
+                end = start + self.window_rows - 1 if start != starts[-1] else None
+                local = self._local_rows(worksheet, start, end)
+                for offset, row in enumerate(values):
+                    row = _trim(list(row))
+                    if local.get(start + offset, []) != row:
+                        self._replace_row(worksheet, start + offset, 1, row)
+                        changed += 1
+                # The API drops trailing empty rows: mirrored rows past the data were cleared or deleted
+                cleared = [row for row in local if row >= start + len(values)]
+                if cleared:
+                    self.db.execute(
+                        "DELETE FROM cells WHERE spreadsheet_id = ? AND worksheet_id = ? AND row >= ? AND row <= ?",
+                        (*key, start + len(values), end or 2 ** 62),
+                    )
+                    changed += len(cleared)
+        return changed
+
+    def refresh(self, worksheet, force=False, max_age=0):
+        """
+        Bring the mirror of `worksheet` up to date. Nothing is read if Drive
+        reports the same revision as at the last sync (unless `force`).
+
+        Diff updates and dedupe always make that check. Lookups that can
+        live with slightly stale data may pass `max_age` (seconds) to skip
+        it when the worksheet was checked that recently.
+
+        Returns:
+            number of rows that changed locally, 0 if nothing was read
+        """
+        with self.lock:
+            state = self._state(worksheet)
+            if state and not force and max_age and self.clock() - state[2] < max_age:
+                return 0
+            modified_time, version = drive_revision(worksheet)
+            if state and not force and (modified_time, version) == (state[0], state[1]) and modified_time:
+                self._save_state(worksheet, modified_time, version)
+                self.db.commit()
+                return 0
+
+            changed = self._read_windows(worksheet)
+            self._save_state(worksheet, modified_time, version)
+            self.db.commit()
+            return changed
+
+    def rows(self, worksheet, first_row=1, last_row=None, first_col=1, last_col=None):
+        """
+        Mirrored values of a block, shaped like worksheet.get_values():
+        missing rows are [], trailing empty cells and rows are dropped.
+        """
+        with self.lock:
+            local = self._local_rows(worksheet, first_row, last_row, first_col, last_col)
+        if not local:
+            return []
+        end = max(local)
+        return [local.get(row, []) for row in range(first_row, end + 1)]
+
+    def last_row(self, worksheet):
+        """Last mirrored row with data (0 if the worksheet is empty)."""
+        with self.lock:
+            return self._last_row(worksheet)
+
+    def find(self, worksheet, col, value):
+        """Row numbers whose cell in column `col` equals `value`."""
+        with self.lock:
+            return [row for (row,) in self.db.execute(
+                "SELECT row FROM cells WHERE spreadsheet_id = ? AND worksheet_id = ? AND col = ? AND value = ? "
+                "ORDER BY row",
+                (*self._key(worksheet), col, value),
+            )]
+
+    def write(self, worksheet, first_row, first_col, rows):
+        """
+        Record values our own action wrote, starting at (first_row, first_col).
+        Only the columns each row covers are replaced.
+        """
+        with self.lock:
+            for offset, row in enumerate(rows):
+                self._replace_row(worksheet, first_row + offset, first_col, row, first_col + len(row) - 1)
+            self.db.commit()
+
+    def begin(self, worksheet):
+        """
+        Call before our own writes to `worksheet`: checks that the mirror is
+        still at the spreadsheet's current revision and notes how many write
+        requests the running action has made so far, for settle().
+        """
+        with self.lock:
+            state = self._state(worksheet)
+            run_metrics = metrics.current()
+            revision = drive_revision(worksheet) if state and run_metrics else None
+            in_sync = revision and revision[1] is not None and revision == (state[0], state[1])
+            self.writing[self._key(worksheet)] = (revision[1], run_metrics.write_calls()) if in_sync else None
+
+    def settle(self, worksheet):
+        """
+        After our own writes, record the revision they produced so the next
+        refresh does not re-read them. That is only done when begin() found
+        the mirror in sync and Drive's `version` moved by exactly the number
+        of write requests the action made since: any other change (an edit by
+        someone else, even during our writes) keeps the old revision, and the
+        next refresh re-reads the worksheet.
+        """
+        with self.lock:
+            started = self.writing.pop(self._key(worksheet), None)
+            run_metrics = metrics.current()
+            if not started or not run_metrics:
+                return
+            version, writes = started
+            modified_time, new_version = drive_revision(worksheet)
+            if new_version is None or int(new_version) != int(version) + run_metrics.write_calls() - writes:
+                return
+            self._save_state(worksheet, modified_time, new_version)
+            self.db.commit()
+
+    def close(self):
+        with self.lock:
+            self.db.close()
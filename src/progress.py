@@ -0,0 +1,52 @@
+import time
+
+
+class Progress:
+    """
+    Prints row progress, rate and ETA at most once every `interval` seconds,
+    instead of one line per row.
+    """
+
+    def __init__(self, label="rows", total=None, interval=2.0, clock=time.monotonic):
+        self.label = label
+        self.total = total
+        self.interval = interval
+        self.clock = clock
+        self.done = 0
+        self.started = clock()
+        self.last_print = None
+
+    def _line(self):
+        elapsed = max(self.clock() - self.started, 1e-9)
+        rate = self.done / elapsed
+        line = f"📤 {self.done:,}"
+        if self.total:
+            line += f"/{self.total:,}"
+        line += f" {self.label} — {rate:,.0f} {self.label}/s"
+        if self.total and rate > 0 and self.done < self.total:
+            line += f" — ETA {format_seconds((self.total - self.done) / rate)}"
+        return line
+
+    def update(self, count=1):
+        """Add `count` finished items and print if the interval has passed."""
+        self.done += count
+        now = self.clock()
+        if self.last_print is None or now - self.last_print >= self.interval:
+            self.last_print = now
+            print(self._line())
+
+    def finish(self):
+        """Print the final line with the total time."""
+        elapsed = self.clock() - self.started
+        print(f"{self._line()} — done in {format_seconds(elapsed)}")
+
+
+def format_seconds(seconds):
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds}s"
+    minutes, seconds = divmod(seconds, 60)
+    if minutes < 60:
+        return f"{minutes}m{seconds:02d}s"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m"
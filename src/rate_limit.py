@@ -0,0 +1,224 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+from gspread.exceptions import APIError
+from gspread.http_client import HTTPClient
+
+from src import metrics
+
+# Google Sheets API default quotas (requests per minute)
+DEFAULT_LIMITS = {
+    "read_per_minute": 60,
+    "write_per_minute": 60,
+    "project_read_per_minute": 300,
+    "project_write_per_minute": 300,
+    "max_retries": 8,
+    "base_backoff": 1.0,
+    "max_backoff": 64.0,
+}
+
+RETRY_STATUSES = (408, 429, 500, 502, 503, 504)
+
+# Requests that leave the sheet the same when sent twice. A 408/5xx may come
+# after the server applied the request, so only these are retried on one;
+# anything else (values.append, spreadsheets.batchUpdate) only on a quota error.
+IDEMPOTENT_ENDPOINTS = ("values.update", "values.batchUpdate", "values.clear", "values.batchClear")
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket allowing `rate_per_minute` requests per minute,
+    with bursts of up to `capacity` requests.
+    """
+
+    def __init__(self, rate_per_minute, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or max(1, int(rate_per_minute // 6))
+        self.tokens = float(self.capacity)
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, tokens=1):
+        """Block until `tokens` tokens are available, then take them."""
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            self.sleep(wait)
+
+    def drain(self):
+        """Empty the bucket, e.g. after the server reported a quota error."""
+        with self.lock:
+            self._refill()
+            self.tokens = 0.0
+
+
+# Project buckets are shared by every limiter in the process using the same project
+_project_buckets = {}
+_project_lock = threading.Lock()
+
+
+def _project_bucket(project, kind, rate_per_minute, clock, sleep):
+    with _project_lock:
+        key = (project, kind)
+        if key not in _project_buckets:
+            _project_buckets[key] = TokenBucket(rate_per_minute, clock=clock, sleep=sleep)
+        return _project_buckets[key]
+
+
+class QuotaLimiter:
+    """
+    Keeps Sheets API calls under the per-user and per-project read/write
+    quotas, and computes jittered exponential backoff delays for retries.
+    """
+
+    def __init__(self, limits=None, project="default", clock=time.monotonic, sleep=time.sleep):
+        self.limits = dict(DEFAULT_LIMITS, **(limits or {}))
+        self.sleep = sleep
+        self.buckets = {
+            "read": [
+                TokenBucket(self.limits["read_per_minute"], clock=clock, sleep=sleep),
+                _project_bucket(project, "read", self.limits["project_read_per_minute"], clock, sleep),
+            ],
+            "write": [
+                TokenBucket(self.limits["write_per_minute"], clock=clock, sleep=sleep),
+                _project_bucket(project, "write", self.limits["project_write_per_minute"], clock, sleep),
+            ],
+        }
+
+    def acquire(self, kind):
+        for bucket in self.buckets[kind]:
+            bucket.acquire()
+
+    def throttle(self, kind):
+        """Called on a quota error so the other threads slow down too."""
+        for bucket in self.buckets[kind]:
+            bucket.drain()
+
+    def backoff(self, attempt, retry_after=None):
+        """Seconds to wait before retry number `attempt` (0-based)."""
+        if retry_after is not None:
+            return min(retry_after, self.limits["max_backoff"])
+        delay = min(self.limits["base_backoff"] * (2 ** attempt), self.limits["max_backoff"])
+        # Full jitter keeps parallel workers from retrying in lockstep
+        return random.uniform(0, delay)
+
+
+def request_kind(method):
+    return "read" if method.lower() == "get" else "write"
+
+
+def retry_after_seconds(response):
+    """Parse a Retry-After header (seconds or HTTP date), or return None."""
+    value = response.headers.get("Retry-After") if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_idempotent(method, url):
+    return method.lower() == "get" or metrics.endpoint_name(method, url) in IDEMPOTENT_ENDPOINTS
+
+
+def should_retry(error, idempotent=True):
+    """
+    Whether a failed request may be sent again: always on a quota error
+    (429, or a Drive usageLimits 403), on 408/5xx only if `idempotent`.
+    """
+    code = error.response.status_code
+    if code == 429:
+        return True
+    if code in RETRY_STATUSES:
+        return idempotent
+    # The Drive API reports rate limits as 403 with a usageLimits domain
+    if code == 403:
+        errors = error.error.get("errors", []) if isinstance(error.error, dict) else []
+        return any(e.get("domain") == "usageLimits" for e in errors)
+    return False
+
+
+def _body_size(response):
+    body = response.request.body if response is not None and response.request is not None else None
+    return len(body) if body else 0
+
+
+class RateLimitedHTTPClient(HTTPClient):
+    """
+    gspread HTTP client that waits for quota tokens before every request and
+    retries 429 (and Drive usageLimits 403) responses, plus 408/5xx responses
+    to idempotent requests, with jittered exponential backoff, honoring
+    Retry-After.
+
+    Each request is recorded as stage api.<endpoint> of the running action's
+    metrics, time spent waiting for quota as api.quota_wait, and every retry
+    with its backoff delay as api.retry.
+    """
+
+    def __init__(self, auth, session=None, limiter=None):
+        super().__init__(auth, session)
+        self.limiter = limiter or QuotaLimiter()
+
+    def request(self, method, endpoint, *args, **kwargs):
+        kind = request_kind(method)
+        run_metrics = metrics.current()
+        stage = "api." + metrics.endpoint_name(method, endpoint)
+        idempotent = is_idempotent(method, endpoint)
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            self.limiter.acquire(kind)
+            sent = time.perf_counter()
+            if run_metrics and sent - start > 0.001:
+                run_metrics.observe("api.quota_wait", sent - start)
+            try:
+                response = super().request(method, endpoint, *args, **kwargs)
+                if run_metrics:
+                    run_metrics.observe(stage, time.perf_counter() - sent, _body_size(response), len(response.content))
+                return response
+            except APIError as e:
+                if run_metrics:
+                    run_metrics.observe(stage, time.perf_counter() - sent, _body_size(e.response),
+                                        len(e.response.content), error=True)
+                if not should_retry(e, idempotent) or attempt >= self.limiter.limits["max_retries"]:
+                    raise
+                if e.response.status_code == 429:
+                    self.limiter.throttle(kind)
+                delay = self.limiter.backoff(attempt, retry_after_seconds(e.response))
+                print(f"⏳ {e.response.status_code} from Sheets API, retrying in {delay:.1f}s "
+                      f"(attempt {attempt + 1}/{self.limiter.limits['max_retries']})")
+                if run_metrics:
+                    run_metrics.observe("api.retry", delay)
+                self.limiter.sleep(delay)
+                attempt += 1
+
+
+def rate_limited_http_client(limits=None, project="default"):
+    """
+    Return an `http_client` factory for gspread.authorize / gspread.Client
+    that shares one QuotaLimiter between every client it creates.
+    """
+    limiter = QuotaLimiter(limits, project)
+
+    def factory(auth, session=None):
+        return RateLimitedHTTPClient(auth, session, limiter=limiter)
+
+    return factory
@@ -0,0 +1,169 @@
+import importlib.util
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from src import metrics
+
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_PER_SPREADSHEET = 2
+
+# Process exit codes for unattended runs (cron / CI)
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+
+
+def run_custom_script(action):
+    """Load custom_script/<file> and call its main(). Returns True on success."""
+    script_file = action.get("custom_script")
+    if not script_file:
+        print("❌ No custom script specified in action.")
+        return False
+
+    script_path = os.path.join("custom_script", script_file)
+    if not os.path.exists(script_path):
+        print(f"❌ Custom script not found: {script_path}")
+        return False
+
+    spec = importlib.util.spec_from_file_location("custom_script", script_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    if not hasattr(module, "main"):
+        print(f"❌ Script {script_file} does not have a main() function.")
+        return False
+
+    print(f"▶ Running custom script: {script_file}")
+    result = module.main()
+    return result is not False
+
+
+def run_action(client, spreadsheet_id, action, config, cache=None, interactive=True, resume=False):
+    """
+    Run one action from actions.json, sharing `cache` (a SheetCache).
+    With interactive=False the action must not wait for keyboard input.
+    With resume=True, CSV appends continue from their journal.
+
+    Stage timings and API calls are written to <metrics_dir>/<name>.json
+    and <name>.prom after the run.
+
+    Returns:
+        True if the action succeeded, False otherwise
+    """
+    run_metrics = metrics.Metrics(action.get("name"))
+    start = time.perf_counter()
+    try:
+        with metrics.collecting(run_metrics):
+            run_metrics.success = _dispatch(client, spreadsheet_id, action, config, cache, interactive, resume)
+        return run_metrics.success
+    finally:
+        run_metrics.seconds = time.perf_counter() - start
+        try:
+            path = run_metrics.write(config.get("metrics_dir", metrics.DEFAULT_METRICS_DIR))
+            print(f"📊 Metrics written to {path}")
+        except OSError as e:
+            print(f"⚠️ Failed to write metrics: {e}")
+
+
+def _dispatch(client, spreadsheet_id, action, config, cache, interactive, resume):
+    action_type = action.get("action")
+    if action_type == "append":
+        from src import append
+        return append.main(client, spreadsheet_id, action, config, cache, interactive, resume)
+    elif action_type == "update":
+        from src import update
+        return update.main(client, spreadsheet_id, action, config, cache, interactive)
+    elif action_type == "snapshot":
+        from src import snapshot
+        return snapshot.main(client, spreadsheet_id, action, config, cache, interactive)
+    elif action_type == "backup":
+        from src import backup_store
+        return backup_store.main(client, spreadsheet_id, action, config, cache, interactive)
+    elif action_type == "custom_script":
+        return run_custom_script(action)
+
+    print(f"❌ Unsupported action type '{action_type}'.")
+    return False
+
+
+def needs_input(action):
+    """True if the action can only run with keyboard input (manual sources)."""
+    return action.get("action") in ("append", "update") and action.get("source_type", "manual") == "manual"
+
+
+def run_actions(client, spreadsheet_id, actions, config, max_workers=None, per_spreadsheet=None, cache=None,
+                resume=False):
+    """
+    Run several actions at once on a thread pool.
+
+    At most `max_workers` actions run in total, and at most `per_spreadsheet`
+    of them target the same spreadsheet (an action may set its own
+    `spreadsheet_id`). Actions that need keyboard input are skipped.
+    All actions share one SheetCache. `resume` is passed on to run_action.
+
+    Returns:
+        list of result dicts (name, action, status, seconds, error), in input order
+    """
+    if cache is None and client is not None:
+        from src.sheet_cache import SheetCache
+        cache = SheetCache(client)
+    concurrency = config.get("concurrency", {})
+    max_workers = max_workers or concurrency.get("max_workers", DEFAULT_MAX_WORKERS)
+    per_spreadsheet = per_spreadsheet or concurrency.get("per_spreadsheet", DEFAULT_PER_SPREADSHEET)
+
+    semaphores = {}
+    semaphores_lock = threading.Lock()
+
+    def spreadsheet_slot(sheet_id):
+        with semaphores_lock:
+            if sheet_id not in semaphores:
+                semaphores[sheet_id] = threading.Semaphore(per_spreadsheet)
+            return semaphores[sheet_id]
+
+    def run_one(action):
+        result = {"name": action.get("name"), "action": action.get("action"), "error": ""}
+        if needs_input(action):
+            result.update(status="skipped", seconds=0.0, error="needs keyboard input")
+            return result
+
+        target_id = action.get("spreadsheet_id") or spreadsheet_id
+        with spreadsheet_slot(target_id):
+            start = time.perf_counter()
+            try:
+                ok = run_action(client, target_id, action, config, cache, interactive=False, resume=resume)
+                result["status"] = "ok" if ok else "failed"
+            except Exception as e:
+                result["status"] = "failed"
+                result["error"] = str(e)
+            result["seconds"] = time.perf_counter() - start
+        return result
+
+    results = [None] * len(actions)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(run_one, action): i for i, action in enumerate(actions)}
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+    return results
+
+
+def exit_code(results):
+    """EXIT_OK if every action succeeded, EXIT_FAILED if any failed or was skipped."""
+    return EXIT_OK if all(r["status"] == "ok" for r in results) else EXIT_FAILED
+
+
+def print_summary(results, elapsed):
+    """Print one line per action and the combined totals."""
+    icons = {"ok": "✅", "failed": "❌", "skipped": "⏭️"}
+    print("\n=== Run summary ===")
+    for result in results:
+        line = f"{icons.get(result['status'], '?')} {result['name']} ({result['action']}): {result['status']} in {result['seconds']:.1f}s"
+        if result["error"]:
+            line += f" — {result['error']}"
+        print(line)
+
+    counts = {status: sum(1 for r in results if r["status"] == status) for status in icons}
+    serial = sum(r["seconds"] for r in results)
+    print(f"\n{counts['ok']} ok, {counts['failed']} failed, {counts['skipped']} skipped — "
+          f"wall time {elapsed:.1f}s (serial time {serial:.1f}s)")
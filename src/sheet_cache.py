@@ -0,0 +1,87 @@
+import threading
+import time
+
+DEFAULT_TTL = 300
+
+
+class SheetCache:
+    """
+    Caches opened spreadsheets and their worksheets, keyed by spreadsheet ID
+    and by worksheet title and GID, so repeated actions in one session do not
+    re-fetch metadata.
+
+    Opening a spreadsheet costs one metadata fetch and listing its worksheets
+    one more; later lookups are free until `ttl` seconds pass or the entry
+    is invalidated.
+    """
+
+    def __init__(self, client, ttl=DEFAULT_TTL, clock=time.monotonic):
+        self.client = client
+        self.ttl = ttl
+        self.clock = clock
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def _entry(self, spreadsheet_id):
+        entry = self.entries.get(spreadsheet_id)
+        if entry and self.clock() - entry["loaded"] < self.ttl:
+            return entry
+
+        spreadsheet = self.client.open_by_key(spreadsheet_id)
+        entry = {"spreadsheet": spreadsheet, "by_title": None, "by_id": None, "loaded": self.clock()}
+        self.entries[spreadsheet_id] = entry
+        return entry
+
+    def _load_worksheets(self, entry):
+        worksheets = entry["spreadsheet"].worksheets()
+        entry["by_title"] = {ws.title: ws for ws in worksheets}
+        entry["by_id"] = {ws.id: ws for ws in worksheets}
+
+    def spreadsheet(self, spreadsheet_id):
+        """Return the gspread Spreadsheet for `spreadsheet_id`."""
+        with self.lock:
+            return self._entry(spreadsheet_id)["spreadsheet"]
+
+    def _lookup(self, entry, name, gid):
+        if gid not in (None, ""):
+            return entry["by_id"].get(int(gid))
+        if not name:
+            # Blank sheet name means the first worksheet
+            return next(iter(entry["by_id"].values()), None)
+        return entry["by_title"].get(name)
+
+    def worksheet(self, spreadsheet_id, name=None, gid=None):
+        """
+        Return a worksheet by title, or by GID when `gid` is given. A blank
+        name returns the first worksheet. A miss on a cached list reloads it
+        once before raising WorksheetNotFound.
+        """
+        with self.lock:
+            entry = self._entry(spreadsheet_id)
+            fresh = entry["by_title"] is None
+            if fresh:
+                self._load_worksheets(entry)
+            worksheet = self._lookup(entry, name, gid)
+            if worksheet is None and not fresh:
+                self._load_worksheets(entry)
+                worksheet = self._lookup(entry, name, gid)
+            if worksheet is None:
+                from gspread.exceptions import WorksheetNotFound
+                raise WorksheetNotFound(name if gid in (None, "") else f"gid={gid}")
+            return worksheet
+
+    def worksheets(self, spreadsheet_id):
+        """Return every worksheet of the spreadsheet, in tab order."""
+        with self.lock:
+            entry = self._entry(spreadsheet_id)
+            if entry["by_title"] is None:
+                self._load_worksheets(entry)
+            return list(entry["by_id"].values())
+
+    def invalidate(self, spreadsheet_id=None):
+        """Forget one spreadsheet, or everything when no ID is given."""
+        with self.lock:
+            if spreadsheet_id is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(spreadsheet_id, None)
@@ -0,0 +1,235 @@
+import os
+import re
+import time
+from datetime import datetime
+
+from src import metrics
+from src.format_plan import DATE_FORMAT
+from src.sheet_cache import SheetCache
+
+DEFAULT_SNAPSHOT_DIR = "snapshots"
+
+# File extension of each snapshot format
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+
+NUMERIC_TYPES = ("number", "percent", "currency")
+
+# Date cells come back as display strings; these are tried in order
+DATE_PARSE_FORMATS = (DATE_FORMAT, "%m/%d/%Y", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d")
+
+
+def column_names(header, width):
+    """
+    Column names from the header row: blank names become column_<n> and
+    repeated names get a _<n> suffix, so every column can be addressed.
+    """
+    names = []
+    seen = set()
+    for i in range(width):
+        name = str(header[i]).strip() if i < len(header) and header[i] not in (None, "") else f"column_{i + 1}"
+        unique = name
+        n = 2
+        while unique in seen:
+            unique = f"{name}_{n}"
+            n += 1
+        seen.add(unique)
+        names.append(unique)
+    return names
+
+
+def _to_float(value):
+    if isinstance(value, bool) or value in (None, ""):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip().replace(",", "")
+    try:
+        if text.endswith("%"):
+            return float(text[:-1]) / 100
+        return float(text)
+    except ValueError:
+        return None
+
+
+def _to_datetime(value):
+    if value in (None, ""):
+        return None
+    text = str(value).strip()
+    for fmt in DATE_PARSE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def _to_text(value):
+    return None if value is None else str(value)
+
+
+def arrow_type(fmt_type):
+    """Arrow type of a cell_formats type: numbers are float64, dates timestamps, the rest strings."""
+    import pyarrow as pa
+
+    if fmt_type in NUMERIC_TYPES:
+        return pa.float64()
+    if fmt_type == "date":
+        return pa.timestamp("s")
+    return pa.string()
+
+
+def to_table(values, cell_formats=None):
+    """
+    Convert the values of a worksheet (header row first, as returned by
+    values.batchGet) into a typed Arrow table. Column i is typed from
+    cell_formats[i]; columns past the end of cell_formats are strings.
+    Cells that do not parse as their type become nulls.
+
+    Returns:
+        pyarrow.Table
+    """
+    import pyarrow as pa
+
+    cell_formats = cell_formats or []
+    header, rows = (values[0], values[1:]) if values else ([], [])
+    width = max([len(header)] + [len(row) for row in rows])
+    names = column_names(header, width)
+
+    fields = []
+    arrays = []
+    for i, name in enumerate(names):
+        fmt_type = cell_formats[i].get("type", "text").lower() if i < len(cell_formats) else "text"
+        convert = _to_float if fmt_type in NUMERIC_TYPES else _to_datetime if fmt_type == "date" else _to_text
+        field = pa.field(name, arrow_type(fmt_type))
+        fields.append(field)
+        arrays.append(pa.array([convert(row[i]) if i < len(row) else None for row in rows], type=field.type))
+    return pa.Table.from_arrays(arrays, schema=pa.schema(fields))
+
+
+def resolve_titles(cache, spreadsheet_id, names=None):
+    """Titles of the named worksheets (found by title), or of every worksheet if no names are given."""
+    if names:
+        return [cache.worksheet(spreadsheet_id, name).title for name in names]
+    return [worksheet.title for worksheet in cache.worksheets(spreadsheet_id)]
+
+
+def fetch_values(spreadsheet, titles, value_render_option="UNFORMATTED_VALUE"):
+    """
+    Read whole worksheets in a single values.batchGet. Numbers come back
+    unformatted (or as formulas with FORMULA) and dates as their display
+    strings.
+
+    Returns:
+        dict of worksheet title -> list of rows
+    """
+    from gspread.utils import absolute_range_name
+
+    response = spreadsheet.values_batch_get(
+        [absolute_range_name(title) for title in titles],
+        params={"valueRenderOption": value_render_option, "dateTimeRenderOption": "FORMATTED_STRING"},
+    )
+    value_ranges = response.get("valueRanges", [])
+    return {title: value_range.get("values", []) for title, value_range in zip(titles, value_ranges)}
+
+
+def snapshot_path(snapshot_dir, spreadsheet_id, title, fmt="parquet"):
+    name = re.sub(r"[^\w.-]", "_", title) or "sheet"
+    return os.path.join(snapshot_dir, spreadsheet_id, name + FORMATS[fmt])
+
+
+def write_table(table, path, fmt="parquet"):
+    """
+    Write a table atomically. Arrow IPC files are left uncompressed so they
+    can be memory-mapped without a copy.
+    """
+    import pyarrow as pa
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = path + ".tmp"
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        pq.write_table(table, temp_path)
+    else:
+        with pa.OSFile(temp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(temp_path, path)
+
+
+def read_snapshot(path):
+    """
+    Open a snapshot file, memory-mapped. Use .to_pandas() on the result
+    for a DataFrame.
+
+    Returns:
+        pyarrow.Table
+    """
+    import pyarrow as pa
+
+    if path.endswith(FORMATS["arrow"]):
+        return pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+    import pyarrow.parquet as pq
+    return pq.read_table(path, memory_map=True)
+
+
+def main(client, spreadsheet_id, action, config, cache=None, interactive=True):
+    """
+    Execute a 'snapshot' action: dump worksheets to typed Parquet or Arrow
+    IPC files under <snapshot_dir>/<spreadsheet_id>/, one file per worksheet.
+
+    `snapshot_sheets` lists the worksheets to dump; without it the action's
+    `sheet_name` is used, and without that every worksheet. `cell_formats`
+    gives the column types, `snapshot_format` is parquet (default) or arrow.
+
+    Returns:
+        True if every snapshot file was written, False otherwise
+    """
+    print(f"🟢 Snapshot action started: {action.get('name')}")
+
+    fmt = (action.get("snapshot_format") or "parquet").lower()
+    if fmt not in FORMATS:
+        print(f"❌ Unknown snapshot_format '{fmt}' (use {' or '.join(FORMATS)}).")
+        return False
+    snapshot_dir = action.get("snapshot_dir") or config.get("snapshot_dir", DEFAULT_SNAPSHOT_DIR)
+    cache = cache or SheetCache(client)
+
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        print("❌ Snapshots need pyarrow: pip install pyarrow")
+        return False
+
+    # Resolve the worksheets from the shared metadata cache
+    try:
+        names = action.get("snapshot_sheets") or ([action["sheet_name"]] if action.get("sheet_name") else [])
+        titles = resolve_titles(cache, spreadsheet_id, names)
+        spreadsheet = cache.spreadsheet(spreadsheet_id)
+    except Exception as e:
+        print(f"❌ Failed to open worksheets: {e}")
+        return False
+
+    try:
+        with metrics.stage("read"):
+            sheets = fetch_values(spreadsheet, titles)
+    except Exception as e:
+        print(f"❌ Failed to read worksheets: {e}")
+        return False
+
+    taken = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    try:
+        for title in titles:
+            with metrics.stage("convert"):
+                table = to_table(sheets.get(title, []), action.get("cell_formats", []))
+                table = table.replace_schema_metadata({
+                    "spreadsheet_id": spreadsheet_id,
+                    "worksheet": title,
+                    "taken": taken,
+                })
+            path = snapshot_path(snapshot_dir, spreadsheet_id, title, fmt)
+            with metrics.stage("write"):
+                write_table(table, path, fmt)
+            print(f"✅ {title}: {table.num_rows:,} rows × {table.num_columns} columns → {path}")
+    except Exception as e:
+        print(f"❌ Failed to write snapshot: {e}")
+        return False
+
+    return True
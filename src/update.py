@@ -1,11 +1,196 @@
 import gspread
 from src.manage_actions import prompt_input
-from src.helper import format_row, read_csv_with_locale
+from src.helper import split_rows_by_payload, normalize_cell, writes_in_flight
+from src.batch_requests import FormatBatch
+from src.format_plan import compile_formats
+from src.sheet_cache import SheetCache
+from src.mirror import get_mirror
+from src import metrics
 from datetime import datetime
 
-def main(client, spreadsheet_id, action, config):
+# Keep each values.batchUpdate body under ~2 MB, as recommended by the Sheets API
+MAX_PAYLOAD_BYTES = 2_000_000
+
+
+def request_chunks(items, max_payload_bytes=MAX_PAYLOAD_BYTES, in_flight=1):
+    """
+    Split rows (or values.batchUpdate blocks) into one chunk per request:
+    each under `max_payload_bytes`, and with `in_flight` > 1 at least that
+    many chunks when there are enough items, so concurrent writes have work
+    to share.
+
+    Returns:
+        list of (offset, chunk) tuples
+    """
+    per_part = max(1, -(-len(items) // in_flight))
+    chunks = []
+    for part_start in range(0, len(items), per_part):
+        for offset, chunk in split_rows_by_payload(items[part_start:part_start + per_part], max_payload_bytes):
+            chunks.append((part_start + offset, chunk))
+    return chunks
+
+
+def write_block(worksheet, start_row, start_col, rows, max_payload_bytes=MAX_PAYLOAD_BYTES, mirror=None,
+                in_flight=1):
+    """
+    Write rows as one rectangular block starting at (start_row, start_col)
+    with values.batchUpdate, split only when the payload gets too large.
+    With `in_flight` > 1 the block is split into at least that many
+    requests, sent concurrently with an AsyncSheetsClient.
+    Written values are recorded in `mirror` (a SheetMirror), if given.
+
+    Returns:
+        number of requests sent
+    """
+    chunks = request_chunks(rows, max_payload_bytes, in_flight)
+    blocks = []
+    for offset, chunk in chunks:
+        first_row = start_row + offset
+        last_row = first_row + len(chunk) - 1
+        last_col = start_col + max(len(row) for row in chunk) - 1
+        blocks.append({"range": block_range(first_row, start_col, last_row, last_col), "values": chunk})
+
+    if mirror:
+        mirror.begin(worksheet)
+    if in_flight > 1 and len(blocks) > 1:
+        from src.async_client import batch_update_all
+        batch_update_all(worksheet, [[block] for block in blocks], in_flight)
+        if mirror:
+            for offset, chunk in chunks:
+                mirror.write(worksheet, start_row + offset, start_col, chunk)
+    else:
+        for (offset, chunk), block in zip(chunks, blocks):
+            worksheet.batch_update([block], value_input_option="USER_ENTERED")
+            if mirror:
+                mirror.write(worksheet, start_row + offset, start_col, chunk)
+    if mirror:
+        mirror.settle(worksheet)
+    return len(blocks)
+
+
+def block_range(start_row, start_col, end_row, end_col):
+    return f"{gspread.utils.rowcol_to_a1(start_row, start_col)}:{gspread.utils.rowcol_to_a1(end_row, end_col)}"
+
+
+def changed_blocks(current, rows):
+    """
+    Find the cells of `rows` that differ from `current` (the values already in
+    the sheet, FORMULA render) and group them into rectangles: runs of changed
+    cells within a row, joined with the same run in the rows below.
+
+    Returns:
+        list of (first_row, first_col, last_row, last_col) offsets into `rows`,
+        inclusive
+    """
+    open_blocks = {}
+    blocks = []
+    for i, row in enumerate(rows):
+        sheet_row = current[i] if i < len(current) else []
+        runs = []
+        run_start = None
+        for j, value in enumerate(row):
+            old = sheet_row[j] if j < len(sheet_row) else ""
+            if normalize_cell(value) != normalize_cell(old):
+                if run_start is None:
+                    run_start = j
+            elif run_start is not None:
+                runs.append((run_start, j - 1))
+                run_start = None
+        if run_start is not None:
+            runs.append((run_start, len(row) - 1))
+
+        next_open = {}
+        for run in runs:
+            first_row = open_blocks.pop(run, i)
+            next_open[run] = first_row
+        # Runs that did not continue into this row are finished
+        for (first_col, last_col), first_row in open_blocks.items():
+            blocks.append((first_row, first_col, i - 1, last_col))
+        open_blocks = next_open
+
+    for (first_col, last_col), first_row in open_blocks.items():
+        blocks.append((first_row, first_col, len(rows) - 1, last_col))
+    return sorted(blocks)
+
+
+def write_changes(worksheet, start_row, start_col, rows, max_payload_bytes=MAX_PAYLOAD_BYTES, mirror=None,
+                  in_flight=1):
     """
-    Execute an 'update' action.
+    Read the target block in one values.batchGet and write back only the
+    cells that changed, as few ranges as possible per values.batchUpdate.
+    With a `mirror` (a SheetMirror) the block is read from the local mirror
+    instead, and the written cells are recorded in it. With `in_flight` > 1
+    the ranges are spread over that many concurrent requests.
+
+    Only values are compared: notes are not read, so a row whose note
+    changed but whose values did not is not in changed_rows.
+
+    Returns:
+        (cells_written, cells_skipped, ranges, requests_sent, changed_rows),
+        changed_rows being the offsets into `rows` of the rows with at least
+        one changed cell
+    """
+    width = max(len(row) for row in rows)
+    last_row = start_row + len(rows) - 1
+    if mirror:
+        mirror.refresh(worksheet)
+        current = mirror.rows(worksheet, start_row, last_row, start_col, start_col + width - 1)
+    else:
+        current = worksheet.batch_get(
+            [block_range(start_row, start_col, last_row, start_col + width - 1)],
+            value_render_option="FORMULA",
+            date_time_render_option="FORMATTED_STRING",
+        )[0]
+
+    data = []
+    cells_written = 0
+    changed_rows = set()
+    for first_row, first_col, last_row, last_col in changed_blocks(current, rows):
+        changed_rows.update(range(first_row, last_row + 1))
+        values = [row[first_col:last_col + 1] for row in rows[first_row:last_row + 1]]
+        cells_written += sum(len(row) for row in values)
+        data.append({
+            "range": block_range(start_row + first_row, start_col + first_col,
+                                 start_row + last_row, start_col + last_col),
+            "values": values,
+        })
+
+    def record(chunk):
+        for block in chunk:
+            # gspread prefixes the sheet title to each range it sends
+            first_cell = block["range"].rsplit("!", 1)[-1].split(":")[0]
+            first_row, first_col = gspread.utils.a1_to_rowcol(first_cell)
+            mirror.write(worksheet, first_row, first_col, block["values"])
+
+    chunks = [chunk for _, chunk in request_chunks(data, max_payload_bytes, in_flight)]
+    if mirror and data:
+        mirror.begin(worksheet)
+    if in_flight > 1 and len(chunks) > 1:
+        from src.async_client import batch_update_all
+        batch_update_all(worksheet, chunks, in_flight)
+        if mirror:
+            for chunk in chunks:
+                record(chunk)
+    else:
+        for chunk in chunks:
+            worksheet.batch_update(chunk, value_input_option="USER_ENTERED")
+            if mirror:
+                record(chunk)
+    requests_sent = len(chunks)
+    if mirror and data:
+        mirror.settle(worksheet)
+    cells_skipped = sum(len(row) for row in rows) - cells_written
+    return cells_written, cells_skipped, len(data), requests_sent, sorted(changed_rows)
+
+
+def main(client, spreadsheet_id, action, config, cache=None, interactive=True):
+    """
+    Execute an 'update' action. `cache` is the SheetCache shared across
+    actions; a private one is made if omitted. With interactive=False the
+    action never reads stdin or opens a browser.
+
+    Returns:
+        True if the values and formats were written, False otherwise
     """
     print(f"🟢 Update action started: {action.get('name')}")
 
@@ -14,14 +199,14 @@ def main(client, spreadsheet_id, action, config):
     target_cell = action.get("target_cell", "A1")
     column_total = action.get("column_total", 1)
     locale = action.get("locale") or config.get("locale", "US")
+    cache = cache or SheetCache(client)
 
     # Open the spreadsheet and worksheet
     try:
-        spreadsheet = client.open_by_key(spreadsheet_id)
-        worksheet = spreadsheet.worksheet(sheet_name)
+        worksheet = cache.worksheet(spreadsheet_id, sheet_name)
     except Exception as e:
         print(f"❌ Failed to open sheet '{sheet_name}': {e}")
-        return
+        return False
 
     # ==========================
     # Source: CSV
@@ -32,16 +217,26 @@ def main(client, spreadsheet_id, action, config):
             csv_file += ".csv"
         csv_path = f"csv/{csv_file}"
 
-        df = read_csv_with_locale(csv_path, locale)
+        # pandas is only needed for CSV sources
+        from src.csv_reader import read_csv, csv_settings
+        from src.frame_format import format_frame
+
+        with metrics.stage("parse"):
+            df = read_csv(csv_path, action.get("cell_formats", []), **csv_settings(action, locale))
         if df is None:
-            return
+            return False
 
-        values_list = df.values.tolist()
+        # Format the whole CSV column by column
+        with metrics.stage("format"):
+            formatted_rows, row_notes, formats = format_frame(df, action.get("cell_formats", []), locale)
 
     # ==========================
     # Source: Manual
     # ==========================
     elif source_type == "manual":
+        if not interactive:
+            print("❌ Manual update needs keyboard input; use a CSV source for unattended runs.")
+            return False
         values_list = []
         print("📝 Manual update mode: input one row at a time. Leave blank to stop.")
 
@@ -69,54 +264,71 @@ def main(client, spreadsheet_id, action, config):
             values_list.append(row_values)
             current_row += 1  # move to next row for next input
 
+        plan = compile_formats(action.get("cell_formats", []), locale)
+        formatted_rows, row_notes = [], []
+        for row_values in values_list:
+            formatted_row, notes, _ = plan.format_row(row_values)
+            formatted_rows.append(formatted_row)
+            row_notes.append(notes)
+        formats = plan.formats
+
 
     else:
         print(f"⚠️ Unsupported source_type '{source_type}'. Only 'csv' or 'manual' allowed.")
-        return
+        return False
 
     # ==========================
     # Update cells
     # ==========================
-    # Extract starting row and column from target_cell
-    start_row, start_col = gspread.utils.a1_to_rowcol(target_cell)
-    current_row = 0
-    for i, row_values in enumerate(values_list):
-        try:
-            formatted_row, notes, formats = format_row(row_values, action.get("cell_formats", []), locale)
-
-            # Compute the current row to update
-            current_row = start_row + i
-
-            # Construct A1 notation for the update
-            cell_label = gspread.utils.rowcol_to_a1(current_row, start_col)
-
-            # Update the row starting at the calculated row
-            worksheet.update(cell_label, [formatted_row], value_input_option="USER_ENTERED")
+    # Extract starting row and column from target_cell (first cell if a range is given)
+    start_row, start_col = gspread.utils.a1_to_rowcol(target_cell.split(":")[0])
+    format_batch = FormatBatch(worksheet)
 
-            # Apply TAGS notes
-            for col_index, note_value in notes:
-                if note_value:
-                    note_cell = gspread.utils.rowcol_to_a1(current_row, start_col + col_index)
-                    worksheet.update_note(note_cell, note_value)
+    if not formatted_rows:
+        print("⚠️ No rows to update.")
+        return True
 
-            # Apply cell formats
-            for j, cell_format in enumerate(formats):
-                pattern = cell_format.get("pattern")
-                if pattern:
-                    fmt_cell = gspread.utils.rowcol_to_a1(current_row, start_col + j)
-                    worksheet.format(fmt_cell, {"numberFormat": {"type": "NUMBER", "pattern": pattern}})
+    # Local copy of the sheet, when enabled in config.json
+    mirror = get_mirror(config)
+    in_flight = writes_in_flight(action, config)
+    try:
+        if action.get("diff", "n") == "y":
+            # Diff mode: only cells whose value changed are written
+            with metrics.stage("write"):
+                written, skipped, ranges, requests_sent, changed_rows = write_changes(
+                    worksheet, start_row, start_col, formatted_rows, mirror=mirror, in_flight=in_flight,
+                )
+            print(f"✅ Diff update from {target_cell}: wrote {written} cell(s) in {ranges} range(s), "
+                  f"skipped {skipped} unchanged cell(s), {requests_sent} write request(s)")
+        else:
+            with metrics.stage("write"):
+                requests_sent = write_block(worksheet, start_row, start_col, formatted_rows, mirror=mirror,
+                                            in_flight=in_flight)
+            print(f"✅ Updated {len(formatted_rows)} rows from {target_cell} in {requests_sent} request(s)")
+            changed_rows = range(len(formatted_rows))
+    except Exception as e:
+        print(f"❌ Failed to update rows from {target_cell}: {e}")
+        return False
 
-            print(f"✅ Updated row at {cell_label}: {formatted_row}")
+    # Queue TAGS notes and cell formats of the written rows, sent together in one batch
+    for i in changed_rows:
+        format_batch.add_row(start_row + i, start_col, row_notes[i], formats)
 
-        except Exception as e:
-            print(f"❌ Failed to update row at {current_row}: {e}")
-            break
+    success = True
+    try:
+        with metrics.stage("format-apply"):
+            calls = format_batch.flush()
+        if calls:
+            print(f"🎨 Applied notes and formats in {calls} batch request(s)")
+    except Exception as e:
+        print(f"❌ Failed to apply notes and formats: {e}")
+        success = False
 
 
     # ==========================
     # Optionally open sheet
     # ==========================
-    if action.get("open_sheet", "n") == "y":
+    if interactive and action.get("open_sheet", "n") == "y":
         try:
             gid = worksheet.id
             sheet_url = f"https://docs.google.com/spreadsheets/d/{spreadsheet_id}/edit#gid={gid}&range={target_cell}"
@@ -125,3 +337,4 @@ def main(client, spreadsheet_id, action, config):
             webbrowser.open(sheet_url)
         except Exception as e:
             print(f"⚠️ Failed to open sheet in browser: {e}")
+    return success
@@ -0,0 +1,36 @@
+import pytest
+
+from src.append import append_stream
+from src.fake_sheets import FakeSheetsServer, local_client
+from src.helper import AppendedRangeTracker
+
+UNLIMITED = {
+    "read_per_minute": 1_000_000,
+    "write_per_minute": 1_000_000,
+    "project_read_per_minute": 1_000_000,
+    "project_write_per_minute": 1_000_000,
+}
+FORMATS = [{"pattern": "0.00"}, {}]
+
+
+def failing_chunks(good_chunks):
+    """Yields `good_chunks` two-row chunks, then fails like a CSV parse error would."""
+    for i in range(good_chunks):
+        yield [[i, "a"], [i, "b"]], [[], []], FORMATS
+    raise ValueError("bad row")
+
+
+def test_committed_chunks_get_their_formats_before_a_later_chunk_fails():
+    with FakeSheetsServer() as server:
+        sheet = server.add_spreadsheet("s", sheets={"Main": []}).sheet("Main")
+        worksheet = local_client(server.url, UNLIMITED).open_by_key("s").worksheet("Main")
+        tracker = AppendedRangeTracker()
+
+        with pytest.raises(ValueError):
+            append_stream(worksheet, failing_chunks(2), 1, tracker)
+
+        assert len(sheet.rows) == 4
+        assert tracker.last_row == 4
+        # One notes-and-formats batchUpdate per appended chunk, none left for the end of the run
+        assert server.counters["values.append"] == 2
+        assert server.counters["spreadsheets.batchUpdate"] == 2
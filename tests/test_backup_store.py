@@ -0,0 +1,92 @@
+import random
+
+import pytest
+
+from src.backup_store import BackupStore, apply_ops, diff_ops, retained_versions
+
+HOUR = 3600
+
+
+def mutate(rng, rows):
+    """Edit, insert, delete or move a few rows, like a sheet between two backups."""
+    rows = [list(row) for row in rows]
+    for _ in range(rng.randint(0, 4)):
+        action = rng.choice(("edit", "insert", "delete", "move"))
+        i = rng.randrange(len(rows) + 1)
+        if action == "insert" or not rows:
+            rows.insert(i, [f"new {rng.random():.6f}", rng.randint(0, 9)])
+        elif action == "edit":
+            rows[i % len(rows)][1] = rng.choice((5, 5.0, "5", " x", ""))
+        elif action == "delete":
+            del rows[i % len(rows)]
+        else:
+            block = rows[i:i + 3]
+            del rows[i:i + 3]
+            rows[rng.randrange(len(rows) + 1):0] = block
+    return rows
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_diff_ops_round_trip(seed):
+    rng = random.Random(seed)
+    parent = [f"k{i}" for i in range(40)]
+    hashes = [key for key in parent if rng.random() > 0.2] + ["new"]
+    rng.shuffle(hashes[:10])
+    assert apply_ops(parent, diff_ops(parent, hashes)) == hashes
+
+
+def test_retained_versions_keeps_last_hourly_and_newest():
+    now = 100 * HOUR
+    versions = [{"version": i + 1, "time": now - (10 - i) * HOUR / 2} for i in range(10)]
+    kept = retained_versions(versions, now, keep_last=2, keep_hourly=3)
+    # The two newest, and the newest of each of the last three hours
+    assert kept == {10, 9, 8, 6}
+    assert retained_versions(versions, now) == set(range(1, 11))
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_add_prune_restore_round_trip(tmp_path, seed):
+    rng = random.Random(seed)
+    store = BackupStore(str(tmp_path / "store"))
+    rows = [[f"row {i}", i] for i in range(30)]
+    taken = {}
+    for step in range(50):
+        rows = mutate(rng, rows)
+        now = step * HOUR / 2
+        entry = store.add(rows, taken=now)
+        if entry:
+            taken[entry["version"]] = rows
+        store.prune(keep_last=3, keep_hourly=4, now=now)
+        # Reopening the store must see the same versions
+        store = BackupStore(str(tmp_path / "store"))
+        for version in [v["version"] for v in store.versions]:
+            assert store.restore(version) == taken[version]
+    assert 3 <= len(store.versions) <= 7
+
+
+def test_prune_only_replays_up_to_the_last_rewritten_version(tmp_path):
+    store = BackupStore(str(tmp_path / "store"))
+    rows = [[f"row {i}", i] for i in range(20)]
+    for version in range(1, 11):
+        rows = rows + [[f"added {version}", version]]
+        store.add(rows, taken=version * HOUR)
+
+    read = []
+    original = store._read_version
+    store._read_version = lambda version: read.append(version) or original(version)
+    assert store.prune(keep_last=7) == 3
+
+    # Dropping versions 1-3 rebases version 4 in full; versions 5-10 are not read
+    assert read == [1, 2, 3, 4]
+    reopened = BackupStore(str(tmp_path / "store"))
+    assert [v["version"] for v in reopened.versions] == list(range(4, 11))
+    assert reopened.restore(4) == rows[:24]
+    assert reopened.restore() == rows
+
+
+def test_unchanged_rows_add_no_version(tmp_path):
+    store = BackupStore(str(tmp_path / "store"))
+    rows = [["a", 1], ["b", 2.0]]
+    assert store.add(rows, taken=0)["version"] == 1
+    assert store.add([list(row) for row in rows], taken=1) is None
+    assert len(store.versions) == 1
@@ -0,0 +1,36 @@
+import math
+
+import pytest
+
+from src.csv_reader import iter_csv
+
+FORMATS = [{"type": "number"}, {"type": "text"}]
+
+
+def write_csv(tmp_path, rows):
+    path = tmp_path / "data.csv"
+    path.write_text("n,t\n" + "".join(row + "\n" for row in rows))
+    return str(path)
+
+
+def test_only_the_chunk_with_text_in_a_numeric_column_is_read_as_text(tmp_path):
+    # The quoted newline before the bad chunk checks that the reader restarts on the right row
+    path = write_csv(tmp_path, ['1,"a\nb"', "2,c", "oops,d", "4,e", "5,f", "6,g"])
+
+    chunks = list(iter_csv(path, FORMATS, chunk_size=2))
+
+    assert [len(chunk) for chunk in chunks] == [2, 2, 2]
+    assert [str(chunk["n"].dtype) for chunk in chunks] == ["float64", "str", "float64"]
+    assert chunks[1]["n"].tolist() == ["oops", "4"]
+    assert chunks[2]["n"].tolist() == [5.0, 6.0]
+    assert chunks[0]["t"].tolist() == ["a\nb", "c"]
+
+
+@pytest.mark.parametrize("engine", ["c", "mmap", "pyarrow"])
+def test_empty_cells_are_nan_with_every_engine(tmp_path, engine):
+    path = write_csv(tmp_path, [",x", "2,"])
+
+    chunk = next(iter_csv(path, FORMATS, engine=engine))
+
+    assert math.isnan(chunk["n"][0]) and chunk["n"][1] == 2.0
+    assert chunk["t"][0] == "x" and math.isnan(chunk["t"][1])
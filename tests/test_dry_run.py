@@ -0,0 +1,24 @@
+from src.dry_run import CELL_LIMIT, CallLog, OfflineSpreadsheet, estimate
+
+
+def plan(rows, existing_cells=0, grid=None):
+    log = CallLog()
+    sheet = OfflineSpreadsheet(log, "s", grid=grid).sheet
+    sheet.append_rows([["x", "y"]] * rows)
+    return estimate(log, sheet, existing_cells=existing_cells)
+
+
+def test_grid_cells_count_the_whole_default_grid():
+    result = plan(10)
+    assert result["rows"] == 11
+    assert result["grid_cells"] == 1000 * 26
+
+
+def test_the_grid_grows_to_fit_appended_rows():
+    assert plan(2000, grid=(1000, 5))["grid_cells"] == 2001 * 5
+
+
+def test_an_empty_wide_grid_can_exceed_the_cell_limit():
+    # Few cells written, but the worksheet's grid is already close to the limit
+    assert not plan(10, grid=(100_000, 26))["over_cell_limit"]
+    assert plan(10, existing_cells=CELL_LIMIT - 2_000_000, grid=(100_000, 26))["over_cell_limit"]
@@ -0,0 +1,127 @@
+import gspread
+import pytest
+from gspread.exceptions import APIError
+from gspread.utils import quote
+
+from src import metrics
+from src.fake_sheets import FakeSheetsServer, RedirectSession
+from src.rate_limit import QuotaLimiter, RateLimitedHTTPClient
+
+SPREADSHEET_ID = "quota"
+MAX_RETRIES = 3
+LIMITS = {
+    "read_per_minute": 1_000_000,
+    "write_per_minute": 1_000_000,
+    "project_read_per_minute": 1_000_000,
+    "project_write_per_minute": 1_000_000,
+    "max_retries": MAX_RETRIES,
+    "base_backoff": 1.0,
+}
+
+
+def make_client(server):
+    """RateLimitedHTTPClient for `server` that records backoff delays instead of sleeping."""
+    sleeps = []
+    limiter = QuotaLimiter(LIMITS, project=server.url)
+    # Only the retry backoff; the token buckets still wait (briefly) for real after a 429 drains them
+    limiter.sleep = sleeps.append
+    return RateLimitedHTTPClient(None, session=RedirectSession(server.url), limiter=limiter), sleeps
+
+
+def update(client, row=1):
+    """values.update: safe to send twice."""
+    url = gspread.urls.SPREADSHEET_VALUES_URL % (SPREADSHEET_ID, quote(f"Sheet1!A{row}"))
+    return client.request("put", url, params={"valueInputOption": "RAW"}, json={"values": [[row]]})
+
+
+def append(client):
+    """values.append: adds rows again every time it is sent."""
+    url = gspread.urls.SPREADSHEET_VALUES_APPEND_URL % (SPREADSHEET_ID, quote("Sheet1"))
+    return client.request("post", url, params={"valueInputOption": "RAW"}, json={"values": [["x"]]})
+
+
+@pytest.fixture
+def fake():
+    servers = []
+
+    def start(**options):
+        server = FakeSheetsServer(**options).start()
+        server.add_spreadsheet(SPREADSHEET_ID)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+def test_quota_window_429_is_retried_with_exponential_backoff(fake):
+    server = fake(write_per_minute=2)
+    client, sleeps = make_client(server)
+    update(client, 1)
+    update(client, 2)
+
+    run_metrics = metrics.Metrics("test")
+    with metrics.collecting(run_metrics), pytest.raises(APIError) as error:
+        update(client, 3)
+
+    assert error.value.response.status_code == 429
+    # The window stays full for a minute, so every retry is rejected until they run out
+    assert server.counters["rejected"] == MAX_RETRIES + 1
+    assert len(sleeps) == MAX_RETRIES
+    for attempt, delay in enumerate(sleeps):
+        assert 0 <= delay <= LIMITS["base_backoff"] * 2 ** attempt
+    assert run_metrics.summary()["stages"]["api.retry"]["count"] == MAX_RETRIES
+
+
+def test_injected_429s_are_retried_until_the_request_succeeds(fake):
+    server = fake(error_rate=0.5, seed=3)
+    client, sleeps = make_client(server)
+    client.limiter.limits["max_retries"] = 20
+    for row in range(1, 11):
+        update(client, row)
+
+    assert server.counters["values.update"] == 10
+    assert server.counters["rejected"] == len(sleeps) > 0
+    assert server.spreadsheets[SPREADSHEET_ID].sheet("Sheet1").rows[9] == [10]
+
+
+def test_retry_after_is_honored(fake):
+    server = fake(write_per_minute=1, retry_after=7)
+    client, sleeps = make_client(server)
+    update(client, 1)
+    with pytest.raises(APIError):
+        update(client, 2)
+
+    assert sleeps == [7.0] * MAX_RETRIES
+
+
+def test_append_is_retried_on_429(fake):
+    server = fake(error_rate=1.0)
+    client, sleeps = make_client(server)
+    with pytest.raises(APIError):
+        append(client)
+
+    assert server.counters["rejected"] == MAX_RETRIES + 1
+    assert len(sleeps) == MAX_RETRIES
+
+
+def test_append_is_not_retried_on_5xx(fake):
+    server = fake(error_rate=1.0, error_status=503)
+    client, sleeps = make_client(server)
+    with pytest.raises(APIError) as error:
+        append(client)
+
+    assert error.value.response.status_code == 503
+    assert server.counters["rejected"] == 1
+    assert sleeps == []
+
+
+def test_update_is_retried_on_5xx(fake):
+    server = fake(error_rate=1.0, error_status=503)
+    client, sleeps = make_client(server)
+    with pytest.raises(APIError):
+        update(client)
+
+    assert server.counters["rejected"] == MAX_RETRIES + 1
+    assert len(sleeps) == MAX_RETRIES
@@ -0,0 +1,72 @@
+import pytest
+
+from src.fake_sheets import FakeSheetsServer, local_client
+from src.update import changed_blocks, write_changes
+
+UNLIMITED = {
+    "read_per_minute": 1_000_000,
+    "write_per_minute": 1_000_000,
+    "project_read_per_minute": 1_000_000,
+    "project_write_per_minute": 1_000_000,
+}
+
+
+def test_unchanged_rows_give_no_blocks():
+    rows = [["a", "b"], ["c", "d"]]
+    assert changed_blocks([list(row) for row in rows], rows) == []
+
+
+def test_a_row_splits_into_one_run_per_stretch_of_changed_cells():
+    current = [["a", "b", "c", "d"]]
+    rows = [["X", "b", "Y", "Z"]]
+    assert changed_blocks(current, rows) == [(0, 0, 0, 0), (0, 2, 0, 3)]
+
+
+def test_the_same_run_in_consecutive_rows_merges_into_one_block():
+    current = [["a", "b"], ["c", "d"], ["e", "f"]]
+    rows = [["a", "X"], ["c", "Y"], ["e", "Z"]]
+    assert changed_blocks(current, rows) == [(0, 1, 2, 1)]
+
+
+def test_runs_of_another_width_or_after_a_gap_start_new_blocks():
+    current = [["a", "b"], ["c", "d"], ["e", "f"], ["g", "h"]]
+    rows = [["X", "Y"], ["Z", "d"], ["e", "f"], ["W", "h"]]
+    assert changed_blocks(current, rows) == [(0, 0, 0, 1), (1, 0, 1, 0), (3, 0, 3, 0)]
+
+
+def test_ragged_rows_compare_missing_sheet_cells_as_empty():
+    # The API drops trailing empty cells, so the sheet row can be shorter than ours
+    current = [["a"], ["b", "c", "d"]]
+    rows = [["a", "X"], ["b"]]
+    assert changed_blocks(current, rows) == [(0, 1, 0, 1)]
+
+
+def test_rows_past_the_end_of_current_compare_against_empty_cells():
+    current = [["a", "b"]]
+    rows = [["a", "b"], ["c", ""], ["d", "e"]]
+    # The empty cell matches the missing sheet cell, so the two runs differ in width
+    assert changed_blocks(current, rows) == [(1, 0, 1, 0), (2, 0, 2, 1)]
+
+
+@pytest.mark.parametrize("sheet_value, value", [
+    (5, 5.0),
+    ("5", 5.0),
+    (5.5, "5.5"),
+    ("", None),
+    ("a ", "a"),
+])
+def test_equal_renderings_are_not_changes(sheet_value, value):
+    assert changed_blocks([[sheet_value]], [[value]]) == []
+
+
+def test_write_changes_only_sends_the_changed_cells():
+    with FakeSheetsServer() as server:
+        sheet = server.add_spreadsheet("s", sheets={"Main": [["a", 1, "x"], ["b", 2, "y"], ["c", 3, "z"]]}).sheet("Main")
+        worksheet = local_client(server.url, UNLIMITED).open_by_key("s").worksheet("Main")
+        rows = [["a", 1.0, "x"], ["b", 20, "y"], ["c", 30, "Z"]]
+
+        written, skipped, ranges, requests_sent, changed_rows = write_changes(worksheet, 1, 1, rows)
+
+        assert (written, skipped, ranges, requests_sent, changed_rows) == (3, 6, 2, 1, [1, 2])
+        assert sheet.rows == [["a", 1, "x"], ["b", 20, "y"], ["c", 30, "Z"]]
+        assert server.counters["values.batchUpdate"] == 1